@@ -7,15 +7,15 @@ import matplotlib.pyplot as plt
 from collections import Counter
 import time
 
-from solr_utils.solr_manager import SolrManager
 from streamlit_utils.st_utils import (display_post_and_comment, display_no_result_message,
-                                      display_single_only, get_results, init_session_states,
-                                      suggest_spell_correction, display_analysis)
+                                      display_single_only, get_results, get_solr_manager, init_session_states,
+                                      suggest_spell_correction, display_analysis, display_load_more, display_pending_rebuild_warning,
+                                      SARCASM_OPTIONS)
 
 
-# Set up Solr Core
-solr_manager = SolrManager(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "solr-9.5.0-slim"),
-                           os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "data/merged_all_new.csv"))
+# Solr Core location, the core itself is set up lazily on the first search
+solr_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "solr-9.5.0-slim")
+csv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "data/merged_all_new.csv")
 
 
 tokens_init_format = {
@@ -78,7 +78,12 @@ with st.sidebar:
     with st.expander("Retrieve types:"):
         retrieve_type = st.radio(
             "Retrieve:",
-            ["Comments only", "Posts only", "Posts and Comments (Will take a longer time)"])
+            ["Comments only", "Posts only", "Posts and Comments"])
+
+    with st.expander("Sarcasm:"):
+        sarcasm = st.radio(
+            "Sarcastic opinions:",
+            list(SARCASM_OPTIONS))
 
     with st.expander("Number of results to retrieve:"):
         retrieve_num = st.slider("Choose the number of post/comments to retrieve:", 5, 30, 10)
@@ -94,7 +99,8 @@ if search_button or st.session_state["search_suggested"]:
                 "date_start" : date_start,
                 "date_end" : date_end,
                 "retrieve_type" : retrieve_type,
-                "retrieve_num" : retrieve_num
+                "retrieve_num" : retrieve_num,
+                "sarcasm" : sarcasm
             }
 
         # If not the same query as previous, update query and additional options, and start searching
@@ -103,6 +109,9 @@ if search_button or st.session_state["search_suggested"]:
                 st.session_state["additional_options"] = cur_options
                 st.session_state["query"] = query
 
+                solr_manager = get_solr_manager(solr_dir, csv_path)
+                solr_manager.ensure_ready()
+
                 start_time = time.time()
                 # Get results for current query
                 get_results(solr_manager, tokens_init_format, label_init_format)
@@ -115,6 +124,9 @@ if search_button or st.session_state["search_suggested"]:
                 st.session_state["suggested_query"] = None
                 st.session_state["search_suggested"] = False
 
+                solr_manager = get_solr_manager(solr_dir, csv_path)
+                solr_manager.ensure_ready()
+
                 start_time = time.time()
                 # Get results for current query
                 get_results(solr_manager, tokens_init_format, label_init_format)
@@ -130,6 +142,7 @@ if not st.session_state["results"]:
         st.info("Please type in keywords and click 'Search' to start.")
 # If there is stored results, display it
 else:
+    display_pending_rebuild_warning()
     tab1, tab2 = st.container().tabs(["Opinions on Reddit", "Text Analysis"])
 
     if len(st.session_state["results"]["post"]) > 0 and len(st.session_state["results"]["comment"]) > 0:
@@ -147,9 +160,11 @@ else:
         if tmp_display_state == "posts and comments":
             st.write(f"Retrieved results in: {st.session_state['query_time']:.2f} sec")
             display_post_and_comment()     
+            display_load_more(get_solr_manager(solr_dir, csv_path))
         elif tmp_display_state == "single only":
             st.write(f"Retrieved results in: {st.session_state['query_time']:.2f} sec")
             display_single_only()
+            display_load_more(get_solr_manager(solr_dir, csv_path))
         else:
             display_no_result_message()
             # To display below message if no results
@@ -0,0 +1,51 @@
+# Abbreviation expansion as the notebooks did it, one substitution per key, and with AbbreviationExpander on real Reddit text.
+# --extra-keys adds made up slang to see how each approach grows with the dictionary. Run from the search_engine directory:
+#   python benchmarks/bench_abbreviations.py --csv ../data/all-posts.csv --text-field title --rows 20000 --extra-keys 500
+import re
+
+from common import make_parser, read_texts, timed
+from preprocessing_utils.abbreviations import ABBR_MAPPER, AbbreviationExpander
+
+
+# replace_abbr as it is in the notebooks, the mapping and pattern are rebuilt and the text scanned twice per call
+def notebook_replace_abbr(text, abbr_mapper):
+    abbr_mapper = {key.lower(): val for key, val in abbr_mapper.items()}
+    pattern = r'\b(?:' + r'|'.join(re.escape(abbr) for abbr in [k.lower() for k in abbr_mapper.keys()]) + r')\b'
+    pattern = re.compile(pattern, re.IGNORECASE)
+    num_substitutions = len(re.findall(pattern, text))
+    replaced_text = pattern.sub(lambda match: abbr_mapper[match.group(0).lower()], text)
+    return replaced_text, num_substitutions
+
+
+# One pass over the text for every key. Expansions can themselves be expanded again by later keys.
+def per_key_replace_abbr(text, patterns):
+    num_substitutions = 0
+    for pattern, val in patterns:
+        text, count = pattern.subn(val, text)
+        num_substitutions += count
+    return text, num_substitutions
+
+
+def main():
+    parser = make_parser(texts=True)
+    parser.add_argument("--extra-keys", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = read_texts(args)
+
+    mapper = dict(ABBR_MAPPER)
+    mapper.update({f"slang{i}": f"made up slang {i}" for i in range(args.extra_keys)})
+    print(f"{len(texts)} texts, {len(mapper)} abbreviations")
+
+    patterns = [(re.compile(r'\b' + re.escape(key) + r'\b', re.IGNORECASE), val.replace('\\', '\\\\')) for key, val in mapper.items()]
+    expander = AbbreviationExpander(mapper)
+
+    notebook = timed("notebook", lambda: [notebook_replace_abbr(text, mapper)[0] for text in texts], len(texts))
+    timed("per key", lambda: [per_key_replace_abbr(text, patterns) for text in texts], len(texts))
+    expanded, _ = timed("expander", lambda: expander.expand_batch(texts), len(texts))
+
+    print(f"{sum(a != b for a, b in zip(expanded, notebook))} texts differ from the notebook's output")
+
+
+if __name__ == "__main__":
+    main()
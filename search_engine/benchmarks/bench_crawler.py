@@ -0,0 +1,72 @@
+# Crawls the fake Reddit backend one request at a time (like the notebook, minus its sleeps) and with several workers,
+# then crashes a crawl part way and resumes it, and checks a short crawl stays within Reddit's quota. Needs no network, run from the search_engine directory:
+#   python benchmarks/bench_crawler.py --subreddits 3 --posts 100 --comments 20 --latency 0.05 --workers 8
+import os
+import tempfile
+
+import pandas as pd
+
+from common import make_parser
+from crawler_utils.backends import FakeRedditBackend
+from crawler_utils.crawler import REQUESTS_PER_MINUTE, RedditCrawler
+
+
+def crawl(sources, workers, rpm, args, data_dir, fail_after=None):
+    backend = FakeRedditBackend(args.posts, args.comments, args.latency, fail_after=fail_after)
+    crawler = RedditCrawler(backend, data_dir, max_workers=workers, requests_per_minute=rpm, limit=args.posts)
+    return crawler.crawl(sources)
+
+
+def count_rows(data_dir, kind):
+    frames = [pd.read_csv(os.path.join(data_dir, name), usecols=['id'], dtype=str) for name in os.listdir(data_dir) if name.endswith(f"-{kind}.csv")]
+    ids = pd.concat(frames)['id']
+    return len(ids), ids.nunique()
+
+
+def report(label, stats):
+    print(f"{label:<22} {stats['seconds']:6.2f} sec, {stats['requests'] / stats['seconds']:7.1f} requests/sec, "
+          f"{stats['posts']} posts, {stats['comments']} comments, {stats['rate_limited_seconds']:.1f} sec rate limited")
+
+
+def main():
+    parser = make_parser()
+    parser.add_argument("--subreddits", type=int, default=3)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake request")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=100000, help="Rate limit for the speed runs, high enough not to matter")
+    parser.add_argument("--quota-posts", type=int, default=30, help="Posts in the run at the real quota, 0 to skip it")
+    args = parser.parse_args()
+
+    sources = [(f"sub{i}", None) for i in range(args.subreddits)] + [("sub0", "ev")]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        report("1 worker", crawl(sources, 1, args.rpm, args, os.path.join(data_dir, "sequential")))
+        report(f"{args.workers} workers", crawl(sources, args.workers, args.rpm, args, os.path.join(data_dir, "concurrent")))
+
+        # Crash half way through, then resume in the same directory
+        resume_dir = os.path.join(data_dir, "resume")
+        total_requests = args.subreddits * (args.posts + 2)
+        try:
+            crawl(sources, args.workers, args.rpm, args, resume_dir, fail_after=total_requests // 2)
+        except ConnectionError as e:
+            print(f"Crashed: {e}")
+        report("resumed", crawl(sources, args.workers, args.rpm, args, resume_dir))
+
+        for kind in ["posts", "comments"]:
+            expected = count_rows(os.path.join(data_dir, "concurrent"), kind)
+            rows, unique = count_rows(resume_dir, kind)
+            print(f"{kind:<9} crash and resume wrote {rows} rows, {unique} unique, a clean crawl wrote {expected[0]}")
+
+        if args.quota_posts:
+            # The first burst of requests goes straight through, the rest are spaced out to the quota
+            args.posts = args.quota_posts
+            stats = crawl([("sub0", None)], args.workers, REQUESTS_PER_MINUTE, args, os.path.join(data_dir, "quota"))
+            report(f"{REQUESTS_PER_MINUTE} rpm quota", stats)
+            burst = 10
+            print(f"{burst} requests in the first burst, then {(stats['requests'] - burst) / stats['seconds'] * 60:.0f} requests/min")
+
+
+if __name__ == "__main__":
+    main()
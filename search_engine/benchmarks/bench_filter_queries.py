@@ -0,0 +1,66 @@
+# Repeated date-filtered searches against a running search_reddit core, with the type/date clauses inside q (as before)
+# and as rounded fq filters (as now). Run from the search_engine directory:
+#   python benchmarks/bench_filter_queries.py --rounds 5
+from common import make_parser, summarize
+from solr_utils.queries import QUERY_PATH, build_text_query_params
+from solr_utils.transport import DEFAULT_BASE_URL, SolrTransport
+
+QUERIES = ["tesla", "battery", "charging", "range", "bolt battery", "model 3", "recall", "heat pump", "winter range", "price"]
+
+DATE_RANGES = [["2022-01-01", "2022-12-31"], ["2023-01-01", "2023-06-30"], ["2023-07-01", "2024-03-22"]]
+
+
+# The query builder as it was before the fq split, kept here as the baseline
+def build_inline_params(text, type, date_range=None, num_rows=10):
+    if len(text.split(" ")) > 1:
+        query = f'text:({text.replace(" ", " AND ")})'
+    else:
+        query = f"text:({text})"
+
+    query = query + f" AND type:{type}"
+
+    if date_range:
+        query = query + f" AND created_utc:[{str(date_range[0])}T00:00:00Z TO {str(date_range[1])}T23:59:59Z]"
+
+    return {"q": query, "rows": num_rows, "sort": "upvote desc"}
+
+
+def run(transport, build_params, rounds):
+    # Every text is paired with every date range, so in the first round the same filters come back with different texts.
+    # Later rounds repeat the exact searches, which the query result cache serves for both variants.
+    qtimes = {"first": [], "repeat": []}
+    for round_index in range(rounds):
+        for date_range in DATE_RANGES:
+            for text in QUERIES:
+                response = transport.get(QUERY_PATH, params=build_params(text, "post", date_range))
+                response.raise_for_status()
+                qtimes["first" if round_index == 0 else "repeat"].append(response.json()["responseHeader"]["QTime"])
+    return qtimes
+
+
+def report(label, qtimes):
+    for key, values in qtimes.items():
+        if values:
+            print(f"{label:<12} {key:<7} QTime {summarize(values)} over {len(values)} searches")
+
+
+def main():
+    parser = make_parser()
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    transport = SolrTransport(args.base_url)
+
+    # Start both from the same cold state, a core reload clears Solr's caches
+    transport.get("/solr/admin/cores", params={"action": "RELOAD", "core": "search_reddit"}, timeout=60).raise_for_status()
+    report("inline q", run(transport, build_inline_params, args.rounds))
+
+    transport.get("/solr/admin/cores", params={"action": "RELOAD", "core": "search_reddit"}, timeout=60).raise_for_status()
+    report("fq filters", run(transport, build_text_query_params, args.rounds))
+
+    transport.close()
+
+
+if __name__ == "__main__":
+    main()
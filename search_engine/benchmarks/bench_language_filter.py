@@ -0,0 +1,52 @@
+# The notebook's is_english on every row against LanguageFilter, cold and with its cache warm, run from the search_engine directory:
+#   python benchmarks/bench_language_filter.py --csv ../data/all-posts.csv --text-field title --rows 20000 --processes 4
+import os
+
+from common import make_parser, read_texts, timed
+from preprocessing_utils.language_filter import LanguageFilter, clean_text, detect_english, fast_path, init_worker
+
+
+# is_english as it is in the notebook, kept here as the baseline
+def notebook_is_english(text):
+    import re
+
+    from langdetect import detect
+    from langdetect.lang_detect_exception import LangDetectException
+
+    text = re.sub(r'https?:\/\/.*[\r\n]*', '', text)
+    text = re.sub(r'\d+', '', text)
+    text = re.sub(r'[^\w\s]', '', text)
+
+    try:
+        return detect(text) == 'en'
+    except LangDetectException:
+        return True
+
+
+def main():
+    args = make_parser(texts=True, processes=os.cpu_count()).parse_args()
+
+    texts = read_texts(args)
+    init_worker()
+
+    baseline = timed("notebook", lambda: [notebook_is_english(text) for text in texts], len(texts), "rows")
+
+    language_filter = LanguageFilter(args.processes)
+    for run in ["cold", "warm"]:
+        language_filter.stats = dict.fromkeys(language_filter.stats, 0)
+        results = timed(f"filter {run}", lambda: language_filter.is_english_batch(texts), len(texts), "rows")
+        print(f"filter {run} tiers: {language_filter.stats}")
+    language_filter.close()
+
+    print(f"{sum(a != b for a, b in zip(results, baseline))} rows decided differently from the notebook")
+
+    # Only the fast path can disagree, langdetect is the same on both sides. Short texts are where langdetect is least reliable.
+    decided = [(text, result) for text, result in ((clean_text(text), fast_path(clean_text(text))) for text in texts) if result is not None]
+    for label, min_words, max_words in [("short (< 5 words)", 0, 4), ("longer", 5, float("inf"))]:
+        group = [(text, result) for text, result in decided if min_words <= len(text.split()) <= max_words]
+        disagreements = [text for text, result in group if result != detect_english(text)]
+        print(f"fast path decided {len(group)} {label} rows, langdetect disagrees on {len(disagreements)}: {disagreements[:5]}")
+
+
+if __name__ == "__main__":
+    main()
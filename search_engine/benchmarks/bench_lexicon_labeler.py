@@ -0,0 +1,52 @@
+# Records/sec of the VADER/TextBlob labelling as done in Polarity_and_Subjectivity_Detection.ipynb and with LexiconLabeler,
+# run from the search_engine directory:
+#   python benchmarks/bench_lexicon_labeler.py --csv ../data/merged_all_new.csv --rows 20000 --processes 4
+import os
+
+import pandas as pd
+from nltk.sentiment import SentimentIntensityAnalyzer
+from textblob import TextBlob
+
+from common import make_parser, timed
+from classification_utils.lexicon_labeler import LABEL_COLUMNS, LexiconLabeler, ensure_vader_lexicon
+
+
+# The notebook's iterrows loop and apply passes, kept here as the baseline
+def notebook_labels(df):
+    sia = SentimentIntensityAnalyzer()
+    res = {}
+    for i, row in df.iterrows():
+        res[i] = sia.polarity_scores(row['text'])
+
+    vaders = pd.DataFrame(res).T
+    vaders['vader_sentiment'] = vaders['compound'].apply(lambda score: 'positive' if score >= 0.05 else 'negative' if score <= -0.05 else 'neutral')
+    vaders['vader_subjectivity'] = vaders['compound'].apply(lambda score: 'subjective' if score != 0 else 'objective')
+    vaders["tbsubjectivityscore"] = df["text"].apply(lambda text: TextBlob(text).sentiment.subjectivity)
+    vaders["tbpolarityscore"] = df["text"].apply(lambda text: TextBlob(text).sentiment.polarity)
+    vaders["textblob_sentiment"] = vaders["tbpolarityscore"].apply(lambda score: 'negative' if score < 0 else 'neutral' if score == 0 else 'positive')
+    vaders["textblob_subjectivity"] = vaders['tbsubjectivityscore'].apply(lambda score: 'subjective' if score > 0.5 else 'objective')
+    return vaders
+
+
+def main():
+    parser = make_parser(texts=True, text_field=False, processes=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=1000)
+    args = parser.parse_args()
+
+    ensure_vader_lexicon()
+    df = pd.read_csv(args.csv, nrows=args.rows, dtype=str, keep_default_na=False)[["text"]]
+
+    baseline = timed("notebook", lambda: notebook_labels(df), len(df), "records")
+
+    with LexiconLabeler(args.processes, args.chunksize) as labeler:
+        # Pool start up is part of the measurement
+        labels = timed(f"{args.processes} processes", lambda: labeler.label(df["text"].tolist()), len(df), "records")
+
+    for column in LABEL_COLUMNS:
+        if column.endswith(("sentiment", "subjectivity")):
+            mismatches = (labels[column].to_numpy() != baseline[column].to_numpy()).sum()
+            print(f"{column:<22} {mismatches} rows differ from the notebook")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# Times the cold start and the reruns of app.py without a browser, run from the search_engine directory:
+#   python benchmarks/bench_startup.py --reruns 20
+import os
+import sys
+import time
+
+from common import SEARCH_ENGINE_DIR, make_parser, summarize
+from streamlit.testing.v1 import AppTest
+
+
+def main():
+    parser = make_parser()
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    app_path = os.path.join(SEARCH_ENGINE_DIR, "app.py")
+
+    start_time = time.perf_counter()
+    app = AppTest.from_file(app_path, default_timeout=args.timeout)
+    app.run()
+    cold_start = time.perf_counter() - start_time
+
+    if app.exception:
+        print(app.exception)
+        sys.exit(1)
+
+    # A widget interaction reruns the whole script, toggling the checkbox is the cheapest one
+    rerun_times = []
+    for _ in range(args.reruns):
+        start_time = time.perf_counter()
+        if app.checkbox[0].value:
+            app.checkbox[0].uncheck()
+        else:
+            app.checkbox[0].check()
+        app.run()
+        rerun_times.append(time.perf_counter() - start_time)
+
+    print(f"Cold start: {cold_start * 1000:.1f} ms")
+    print(f"Rerun ({args.reruns}x): {summarize([seconds * 1000 for seconds in rerun_times])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# The notebooks' CSV loading (os.listdir, pd.concat, merge on text) against the Parquet store (column pruning, filters,
+# join on id). Imports the CSVs into a temporary store first, run from the search_engine directory:
+#   python benchmarks/bench_store.py --data-dir ../data --labels "../Innovation/data/sentiment_pred_bert_pretrain_and_annotator.csv" --subreddit BoltEV
+import datetime
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow.compute as pc
+
+from common import make_parser, timed
+from storage_utils.store import RedditStore
+
+
+# How the notebooks combine the crawled files, kept here as the baseline
+def notebook_load(data_dir, kind):
+    frames = [pd.read_csv(os.path.join(data_dir, name)) for name in os.listdir(data_dir) if name.endswith(f"-{kind}.csv") and not name.startswith("all-")]
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = make_parser()
+    parser.add_argument("--data-dir", default="../data")
+    parser.add_argument("--labels", required=True, help="Label CSV keyed by text")
+    parser.add_argument("--subreddit", default="BoltEV")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = RedditStore(store_dir)
+        store.import_csvs(args.data_dir, datetime.date(2024, 3, 20))
+        store.import_labels(args.labels, "labels", filter=pc.field("subreddit_name") == args.subreddit)
+        label_columns = [column for column in store.read_labels("labels").column_names if column != "id"]
+
+        csv_comments = timed("csv: all comment columns", lambda: notebook_load(args.data_dir, "comments"), repeat=args.repeat)
+        store_comments = timed("store: all comment columns", lambda: store.read("comments"), repeat=args.repeat)
+        timed("store: id, body, score", lambda: store.read("comments", ["id", "body", "score"]), repeat=args.repeat)
+
+        subreddit_filter = (pc.field("subreddit_name") == args.subreddit) & (pc.field("score") > 10)
+        timed(f"csv: {args.subreddit} comments with score > 10",
+              lambda: (lambda df: df[(df["subreddit_name"] == args.subreddit) & (df["score"] > 10)])(notebook_load(args.data_dir, "comments")),
+              repeat=args.repeat)
+        timed(f"store: {args.subreddit} comments with score > 10",
+              lambda: store.read("comments", ["id", "body", "score"], subreddit_filter), repeat=args.repeat)
+
+        labels_df = pd.read_csv(args.labels)
+        csv_joined = timed("csv: merge labels on text", lambda: pd.merge(
+            notebook_load(args.data_dir, "comments").rename(columns={"body": "text"}), labels_df, on="text", how="inner"), repeat=args.repeat)
+        store_joined = timed("store: join labels on id", lambda: store.read_labeled(
+            "comments", {"labels": None}, ["id", "body"], pc.field("subreddit_name") == args.subreddit), repeat=args.repeat)
+
+        labelled = store_joined.filter(pc.is_valid(store_joined[label_columns[0]])).num_rows
+        print(f"{len(csv_comments)} comments from the CSVs, {store_comments.num_rows} from the store")
+        print(f"merging on the raw text matched {len(csv_joined)} of {len(labels_df)} labels, joining on id matched {labelled}")
+
+        # Importing the same crawl date again replaces its partitions instead of adding to them
+        store.import_csvs(args.data_dir, datetime.date(2024, 3, 20))
+        print(f"{store.read('comments', ['id']).num_rows} comments after importing the same crawl date twice")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Compares TextAnalyzer with the original get_tokens_freq_dict on real Reddit text, run from the search_engine directory:
+#   python benchmarks/bench_text_analyzer.py --csv ../data/merged_all_new.csv --rows 2000 --processes 4
+import os
+import string
+import sys
+from collections import Counter
+
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+from nltk.tokenize import word_tokenize
+
+from common import REPO_DIR, make_parser, read_texts, timed
+from utils.text_analyzer import TextAnalyzer
+from utils.utils import ensure_nltk_resources
+
+
+# get_tokens_freq_dict as it was before TextAnalyzer, kept here as the baseline
+def legacy_get_tokens_freq_dict(text):
+    tokens = word_tokenize(text)
+
+    translator = str.maketrans('', '', string.punctuation)
+    tokens_without_punctuation = [token.translate(translator) for token in tokens]
+
+    tokens_without_empty = [token for token in tokens_without_punctuation if token.strip()]
+
+    stop_words = set(stopwords.words('english'))
+    filtered_tokens = [token for token in tokens_without_empty if token.lower() not in stop_words]
+
+    lemmatizer = WordNetLemmatizer()
+    lemmatized_tokens = [lemmatizer.lemmatize(token, pos='v') for token in filtered_tokens]
+
+    lowercase_tokens = [token.lower() for token in lemmatized_tokens]
+
+    return Counter(lowercase_tokens)
+
+
+def main():
+    args = make_parser(texts=True, csv=os.path.join(REPO_DIR, "data", "merged_all_new.csv"), text_field=False, rows=2000,
+                       processes=0).parse_args()
+
+    ensure_nltk_resources()
+
+    texts = read_texts(args)
+    print(f"{len(texts)} texts from {args.csv}")
+
+    legacy = timed("legacy", lambda: [legacy_get_tokens_freq_dict(text) for text in texts], len(texts))
+
+    analyzer = TextAnalyzer()
+    cold = timed("TextAnalyzer (cold cache)", lambda: analyzer.get_tokens_freq_batch(texts), len(texts))
+    timed("TextAnalyzer (warm cache)", lambda: analyzer.get_tokens_freq_batch(texts), len(texts))
+
+    if args.processes > 1:
+        timed(f"TextAnalyzer ({args.processes} processes)",
+              lambda: analyzer.get_tokens_freq_batch(texts, processes=args.processes, min_pool_size=0), len(texts))
+
+    print(f"Lemma cache: {analyzer.cache_info()}")
+
+    if legacy != cold:
+        print("Outputs differ from the legacy function!")
+        sys.exit(1)
+    print("Outputs identical to the legacy function.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# What the benchmark scripts share: the search_engine directory on sys.path, the usual text CSV options and timing.
+# Imported by the scripts in this directory before anything from the repo, e.g.
+#   from common import add_text_arguments, read_texts, timed
+import argparse
+import os
+import statistics
+import sys
+import time
+
+SEARCH_ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+REPO_DIR = os.path.dirname(SEARCH_ENGINE_DIR)
+
+sys.path.insert(0, SEARCH_ENGINE_DIR)
+
+LABEL_WIDTH = 40
+
+
+def make_parser(texts=False, csv=None, text_field=True, rows=20000, processes=None):
+    # texts adds --csv (required unless csv gives a default), --text-field and --rows for read_texts,
+    # processes adds --processes with that default. Each script adds what else it needs.
+    parser = argparse.ArgumentParser()
+    if texts:
+        parser.add_argument("--csv", default=csv, required=csv is None)
+        if text_field:
+            parser.add_argument("--text-field", default="text")
+        parser.add_argument("--rows", type=int, default=rows)
+    if processes is not None:
+        parser.add_argument("--processes", type=int, default=processes)
+    return parser
+
+
+def read_texts(args):
+    # The first --rows values of the text column, empty cells stay empty strings
+    import pandas as pd
+
+    text_field = getattr(args, "text_field", "text")
+    return pd.read_csv(args.csv, nrows=args.rows, usecols=[text_field], dtype=str, keep_default_na=False)[text_field].tolist()
+
+
+def timed(label, function, count=None, unit="texts", repeat=1):
+    # Best of repeat calls, printed in ms and, given the number of items, as a rate. Returns what function returned.
+    seconds = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        seconds = min(seconds, time.perf_counter() - start_time)
+
+    rate = f"  ({count / max(seconds, 1e-9):.0f} {unit}/sec)" if count is not None else ""
+    print(f"{label:<{LABEL_WIDTH}} {seconds * 1000:9.1f} ms{rate}")
+    return result
+
+
+def summarize(milliseconds):
+    return (f"mean {statistics.mean(milliseconds):.2f} ms, median {statistics.median(milliseconds):.2f} ms, "
+            f"max {max(milliseconds):.2f} ms")
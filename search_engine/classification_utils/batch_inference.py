@@ -0,0 +1,166 @@
+# Runs the HuggingFace sentiment models from the classification notebooks over many texts at once, run from the search_engine directory:
+#   python -m classification_utils.batch_inference --csv ../data/merged_all_new.csv --output ../data/labelled.csv
+#   python -m classification_utils.batch_inference --csv ../data/merged_all_new.csv --solr
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from classification_utils.model_registry import SEQUENCE_CLASSIFICATION, load_model
+
+# Both models predict negative/neutral/positive in this order
+SENTIMENT_LABELS = {0: "negative", 1: "neutral", 2: "positive"}
+
+MODELS = {
+    # roberta_mnli_classification_majorityvoting.ipynb, gives the label field used by the app
+    "roberta": {
+        "name": "cardiffnlp/twitter-roberta-base-sentiment-latest",
+        "max_length": 500,
+        "label_field": "label",
+        "score_fields": ["neg_score", "neu_score", "pos_score"]
+    },
+    # innovation_bert_and_stack_ensemble.ipynb
+    "bert": {
+        "name": "MarieAngeA13/Sentiment-Analysis-BERT",
+        "max_length": 512,
+        "label_field": "sentiment_pred_bert",
+        "score_fields": []
+    }
+}
+
+
+class BatchClassifier:
+    # Where model_key is looked up and how its model is loaded, subclasses for other kinds of models replace these
+    models = MODELS
+    model_class = SEQUENCE_CLASSIFICATION
+
+    def __init__(self, model_key="roberta", batch_size=32, num_threads=None, buckets_per_window=32, variant="auto",
+                 tokenizer=None, model=None):
+        # Imported here so the rest of the app does not need torch installed
+        import torch
+
+        self.torch = torch
+        self.model_config = self.models[model_key]
+        self.batch_size = batch_size
+
+        # Texts are read in windows of this many, sorted by length inside the window and cut into batches
+        self.window_size = batch_size * buckets_per_window
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        # A quantized or ONNX export is used when one passed the accuracy check (see classification_utils.export),
+        # both are called the same way as the original model
+        if model is None:
+            tokenizer, model = load_model(model_key, self.model_config["name"], self.model_class, variant)
+        self.tokenizer = tokenizer
+        self.model = model
+
+    def predict_scores(self, texts):
+        # Softmax scores for a list of texts, in input order
+        encodings = self.tokenizer(list(texts), max_length=self.model_config["max_length"], truncation=True)["input_ids"]
+
+        # Similar lengths go in the same batch, so batches are padded to about their own length instead of the longest text
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i]))
+        scores = np.zeros((len(encodings), len(SENTIMENT_LABELS)), dtype=np.float32)
+
+        with self.torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_indices = order[start:start + self.batch_size]
+                batch = self.tokenizer.pad({"input_ids": [encodings[i] for i in batch_indices]}, return_tensors="pt")
+                logits = self.model(**batch).logits
+                scores[batch_indices] = self.torch.softmax(logits, dim=-1).numpy()
+
+        return scores
+
+    def get_fields(self, scores):
+        fields = {self.model_config["label_field"]: SENTIMENT_LABELS[int(np.argmax(scores))]}
+        for field, score in zip(self.model_config["score_fields"], scores):
+            fields[field] = float(score)
+        return fields
+
+    def classify_rows(self, rows, text_field="text"):
+        # Streams rows (dicts) back with the label and score fields added, one window at a time
+        window = []
+        for row in rows:
+            window.append(row)
+            if len(window) == self.window_size:
+                yield from self.classify_window(window, text_field)
+                window = []
+        if window:
+            yield from self.classify_window(window, text_field)
+
+    def classify_window(self, window, text_field):
+        scores = self.predict_scores([row.get(text_field) or "" for row in window])
+        for row, row_scores in zip(window, scores):
+            row.update(self.get_fields(row_scores))
+            yield row
+
+    def classify_csv(self, csv_path, output_path, text_field="text"):
+        # Reads and writes the CSV in chunks, the whole file is never in memory
+        stats = {"rows": 0}
+        start_time = time.time()
+        header = True
+
+        for chunk in pd.read_csv(csv_path, chunksize=self.window_size, dtype=str, keep_default_na=False):
+            rows = list(self.classify_rows(chunk.to_dict("records"), text_field))
+            pd.DataFrame(rows).to_csv(output_path, mode="w" if header else "a", header=header, index=False, encoding="utf-8")
+            header = False
+
+            stats["rows"] += len(rows)
+            elapsed = time.time() - start_time
+            print(f"Classified {stats['rows']} rows in {elapsed:.1f} sec ({stats['rows'] / max(elapsed, 1e-9):.1f} rows/sec)")
+
+        stats["seconds"] = time.time() - start_time
+        return stats
+
+    def get_atomic_updates(self, rows, text_field="text"):
+        # Only the predicted fields are set on the already indexed documents
+        for row in self.classify_rows(rows, text_field):
+            fields = [self.model_config["label_field"]] + self.model_config["score_fields"]
+            update = {"id": row["id"]}
+            update.update({field: {"set": row[field]} for field in fields})
+            yield update
+
+    def classify_into_solr(self, csv_path, ingestor, text_field="text"):
+        # Labels go straight into the index through the bulk ingestor, no intermediate CSV
+        def rows():
+            for batch in ingestor.read_csv_batches(csv_path):
+                for row in batch:
+                    if row.get("id"):
+                        yield row
+
+        return ingestor.ingest_docs(self.get_atomic_updates(rows(), text_field))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--output", help="CSV to write the labelled rows to")
+    parser.add_argument("--solr", action="store_true", help="Update the labels of the documents in the search_reddit core instead")
+    parser.add_argument("--model", choices=list(MODELS), default="roberta")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--variant", choices=["auto", "fp32"], default="auto", help="fp32 ignores any registered export")
+    parser.add_argument("--text-field", default="text")
+    args = parser.parse_args()
+
+    classifier = BatchClassifier(args.model, batch_size=args.batch_size, num_threads=args.threads, variant=args.variant)
+
+    if args.solr:
+        from solr_utils.ingest import BulkIngestor
+        from solr_utils.transport import SolrTransport
+
+        stats = classifier.classify_into_solr(args.csv, BulkIngestor(SolrTransport()), args.text_field)
+        print(f"Updated {stats['docs']} documents in {stats['seconds']:.1f} sec.")
+    elif args.output:
+        stats = classifier.classify_csv(args.csv, args.output, args.text_field)
+        print(f"Wrote {stats['rows']} labelled rows to {args.output} in {stats['seconds']:.1f} sec.")
+    else:
+        parser.error("Give --output or --solr")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Exports the sentiment and sarcasm models as dynamic int8 (torch) or ONNX Runtime models, checks them against the
+# annotated data and registers the export for the classifiers only if it is about as accurate as the original.
+# Run from the search_engine directory:
+#   python -m classification_utils.export --model roberta --format quantized
+#   python -m classification_utils.export --model sarcasm --format onnx --max-drop 0.01
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from classification_utils.batch_inference import MODELS, SENTIMENT_LABELS, BatchClassifier
+from classification_utils.model_registry import (FORMATS, SEQ2SEQ, SEQUENCE_CLASSIFICATION, import_onnxruntime_models,
+                                                 load_pretrained, register_export)
+from classification_utils.sarcasm import SARCASM_MODEL, SarcasmClassifier
+from solr_utils.queries import SARCASM_THRESHOLD
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+EXPORT_DIR = os.path.join(REPO_DIR, "models", "exported")
+
+SENTIMENT_EVAL_CSV = os.path.join(REPO_DIR, "Classification_Final", "data", "Annotated Data", "popular_comment_Bolt_annotate_Merged(1).csv")
+SARCASM_EVAL_CSV = os.path.join(REPO_DIR, "Innovation", "data", "true_label.csv")
+
+EXPORTABLE = {
+    "roberta": SEQUENCE_CLASSIFICATION,
+    "bert": SEQUENCE_CLASSIFICATION,
+    "sarcasm": SEQ2SEQ
+}
+
+
+def get_model_name(model_key):
+    return SARCASM_MODEL["name"] if model_key == "sarcasm" else MODELS[model_key]["name"]
+
+
+def load_sentiment_eval(csv_path=SENTIMENT_EVAL_CSV):
+    # Same ground truth as the classification notebooks: rows where both annotators agree,
+    # minus the ones both annotators marked to remove
+    df = pd.read_csv(csv_path)
+    df["annotator_combined"] = np.where(df["annotator 1"] == df["annotator 2"], df["annotator 1"], np.nan)
+    df = df.dropna(subset=["annotator_combined"])
+    df = df[df["remove 1"].isna() | df["remove 2"].isna()]
+    labels = df["annotator_combined"].astype(int).map({-1: "negative", 0: "neutral", 1: "positive"})
+    return df["text"].fillna("").tolist(), labels.tolist()
+
+
+def load_sarcasm_eval(csv_path=SARCASM_EVAL_CSV):
+    # true_label is 1 when either annotator marked the comment as ironic (sarcasm_detection.ipynb)
+    df = pd.read_csv(csv_path)
+    return df["text"].fillna("").tolist(), df["true_label"].astype(int).tolist()
+
+
+def predict_sentiment(tokenizer, model, model_key, texts, batch_size=32):
+    classifier = BatchClassifier(model_key, batch_size=batch_size, tokenizer=tokenizer, model=model)
+    return [SENTIMENT_LABELS[int(index)] for index in np.argmax(classifier.predict_scores(texts), axis=1)]
+
+
+def predict_sarcasm(tokenizer, model, texts, batch_size=16):
+    classifier = SarcasmClassifier(batch_size=batch_size, tokenizer=tokenizer, model=model)
+    return [int(score >= SARCASM_THRESHOLD) for score in classifier.predict_scores(texts)]
+
+
+def predict(model_key, tokenizer, model, texts):
+    if model_key == "sarcasm":
+        return predict_sarcasm(tokenizer, model, texts)
+    return predict_sentiment(tokenizer, model, model_key, texts)
+
+
+def get_metrics(y_true, y_pred):
+    # Accuracy and support weighted F1, the scores reported in the notebooks
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+
+    weighted_f1 = 0.0
+    for label in np.unique(y_true):
+        true_positive = np.sum((y_pred == label) & (y_true == label))
+        predicted = np.sum(y_pred == label)
+        actual = np.sum(y_true == label)
+        precision = true_positive / predicted if predicted else 0.0
+        recall = true_positive / actual
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        weighted_f1 += f1 * actual / len(y_true)
+
+    return {"accuracy": float(np.mean(y_true == y_pred)), "f1": float(weighted_f1)}
+
+
+def evaluate(model_key, tokenizer, model, texts, labels):
+    start_time = time.time()
+    predictions = predict(model_key, tokenizer, model, texts)
+    metrics = get_metrics(labels, predictions)
+    metrics["seconds"] = time.time() - start_time
+    return metrics, predictions
+
+
+def export_quantized(model, tokenizer, output_dir):
+    import torch
+
+    # Only the Linear layers are quantized, weights to int8 ahead of time and activations on the fly
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    os.makedirs(output_dir, exist_ok=True)
+    torch.save(quantized, os.path.join(output_dir, "model.pt"))
+    tokenizer.save_pretrained(output_dir)
+    return quantized, {"format": "quantized", "path": output_dir}
+
+
+def export_onnx(model_name, task, tokenizer, output_dir, int8=False):
+    ORTModelForSequenceClassification, ORTModelForSeq2SeqLM = import_onnxruntime_models()
+    model_class = ORTModelForSeq2SeqLM if task == SEQ2SEQ else ORTModelForSequenceClassification
+
+    model = model_class.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    entry = {"format": "onnx-int8" if int8 else "onnx", "path": output_dir}
+
+    if int8:
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        quantizer = ORTQuantizer.from_pretrained(model)
+        quantizer.quantize(save_dir=output_dir, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+        entry["file_name"] = "model_quantized.onnx"
+        model = model_class.from_pretrained(output_dir, file_name=entry["file_name"])
+
+    return model, entry
+
+
+def export_model(model_key, export_format, output_dir=None, max_drop=0.01, eval_csv=None):
+    task = EXPORTABLE[model_key]
+    model_name = get_model_name(model_key)
+    output_dir = output_dir or os.path.join(EXPORT_DIR, f"{model_key}-{export_format}")
+
+    if export_format == "onnx-int8" and task == SEQ2SEQ:
+        print("onnx-int8 only supports the sentiment models, the T5 encoder and decoder are separate ONNX files")
+        return None
+
+    if model_key == "sarcasm":
+        texts, labels = load_sarcasm_eval(eval_csv or SARCASM_EVAL_CSV)
+    else:
+        texts, labels = load_sentiment_eval(eval_csv or SENTIMENT_EVAL_CSV)
+
+    tokenizer, model = load_pretrained(model_name, task)
+    baseline, baseline_predictions = evaluate(model_key, tokenizer, model, texts, labels)
+    print(f"fp32 {model_name}: accuracy {baseline['accuracy']:.4f}, F1 {baseline['f1']:.4f} in {baseline['seconds']:.1f} sec")
+
+    if export_format == "quantized":
+        exported, entry = export_quantized(model, tokenizer, output_dir)
+    else:
+        exported, entry = export_onnx(model_name, task, tokenizer, output_dir, int8=export_format == "onnx-int8")
+
+    metrics, predictions = evaluate(model_key, tokenizer, exported, texts, labels)
+    agreement = float(np.mean(np.asarray(predictions) == np.asarray(baseline_predictions)))
+    print(f"{export_format} {model_name}: accuracy {metrics['accuracy']:.4f}, F1 {metrics['f1']:.4f} in {metrics['seconds']:.1f} sec, "
+          f"same prediction as fp32 for {agreement:.2%} of {len(texts)} texts")
+
+    # The export is only used by the classifiers if it does not lose more than max_drop on either score
+    if metrics["accuracy"] < baseline["accuracy"] - max_drop or metrics["f1"] < baseline["f1"] - max_drop:
+        print(f"Not registering {output_dir}, it scores more than {max_drop} below the fp32 model")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return None
+
+    entry.update({
+        "model": model_name,
+        "accuracy": metrics["accuracy"],
+        "f1": metrics["f1"],
+        "fp32_accuracy": baseline["accuracy"],
+        "fp32_f1": baseline["f1"],
+        "agreement": agreement,
+        "eval_rows": len(texts)
+    })
+    register_export(model_key, entry)
+    print(f"Registered {output_dir} for {model_key}")
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", choices=list(EXPORTABLE), required=True)
+    parser.add_argument("--format", choices=FORMATS, default="quantized")
+    parser.add_argument("--output-dir", help=f"Defaults to {EXPORT_DIR}/<model>-<format>")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="Largest accepted drop in accuracy and F1")
+    parser.add_argument("--eval-csv", help="Annotated CSV to check the export against")
+    args = parser.parse_args()
+
+    export_model(args.model, args.format, args.output_dir, args.max_drop, args.eval_csv)
+
+
+if __name__ == "__main__":
+    main()
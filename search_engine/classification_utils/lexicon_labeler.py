@@ -0,0 +1,160 @@
+# VADER and TextBlob labels for the whole corpus, as in Polarity_and_Subjectivity_Detection.ipynb, spread over a process pool.
+# Run from the search_engine directory:
+#   python -m classification_utils.lexicon_labeler --csv ../data/cleaned_combined_data.csv --output ../data/lexicon_labels.parquet
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import nltk
+import numpy as np
+import pandas as pd
+
+# Columns of the score array a worker returns, named like the notebook's output
+SCORE_COLUMNS = ["vader_neg", "vader_neu", "vader_pos", "vader_compound", "tbpolarityscore", "tbsubjectivityscore"]
+
+# Same column order as VadersTextBlobCombinedData.csv
+LABEL_COLUMNS = ["vader_neg", "vader_neu", "vader_pos", "vader_compound", "vader_sentiment", "vader_subjectivity",
+                 "tbpolarityscore", "textblob_sentiment", "tbsubjectivityscore", "textblob_subjectivity"]
+
+
+def ensure_vader_lexicon():
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon')
+
+
+def score_texts(sia, texts):
+    # Only the scoring is per text, the labels are worked out afterwards over whole arrays
+    from textblob import TextBlob
+
+    scores = np.empty((len(texts), len(SCORE_COLUMNS)), dtype=np.float64)
+    for i, text in enumerate(texts):
+        vader = sia.polarity_scores(text)
+        sentiment = TextBlob(text).sentiment
+        scores[i] = (vader["neg"], vader["neu"], vader["pos"], vader["compound"], sentiment.polarity, sentiment.subjectivity)
+    return scores
+
+
+def label_scores(scores):
+    # The notebook's thresholds, applied to whole columns instead of one apply() pass per label
+    compound = scores[:, SCORE_COLUMNS.index("vader_compound")]
+    polarity = scores[:, SCORE_COLUMNS.index("tbpolarityscore")]
+    subjectivity = scores[:, SCORE_COLUMNS.index("tbsubjectivityscore")]
+
+    columns = {name: scores[:, i] for i, name in enumerate(SCORE_COLUMNS)}
+    columns["vader_sentiment"] = np.select([compound >= 0.05, compound <= -0.05], ["positive", "negative"], "neutral")
+    columns["vader_subjectivity"] = np.where(compound != 0, "subjective", "objective")
+    columns["textblob_sentiment"] = np.select([polarity < 0, polarity == 0], ["negative", "neutral"], "positive")
+    columns["textblob_subjectivity"] = np.where(subjectivity > 0.5, "subjective", "objective")
+
+    return pd.DataFrame({name: columns[name] for name in LABEL_COLUMNS})
+
+
+# Analyzer of the current pool worker process
+worker_sia = None
+
+
+def init_worker():
+    # Built once per worker, not once per text or chunk
+    from nltk.sentiment import SentimentIntensityAnalyzer
+
+    global worker_sia
+    worker_sia = SentimentIntensityAnalyzer()
+
+
+def score_texts_in_worker(texts):
+    return score_texts(worker_sia, texts)
+
+
+class LexiconLabeler:
+    def __init__(self, processes=None, chunksize=1000):
+        self.processes = processes or os.cpu_count()
+        self.chunksize = chunksize
+
+        ensure_vader_lexicon()
+        self.executor = None
+
+    def get_executor(self):
+        # One pool for the labeler's lifetime, so workers and their analyzers are reused across CSV chunks
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes, initializer=init_worker)
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def score(self, texts):
+        # Scores in input order, the texts are sent to the workers in chunks of self.chunksize
+        texts = [text if isinstance(text, str) else "" for text in texts]
+        if not texts:
+            return np.empty((0, len(SCORE_COLUMNS)), dtype=np.float64)
+
+        if self.processes < 2:
+            init_worker()
+            return score_texts_in_worker(texts)
+
+        chunks = [texts[start:start + self.chunksize] for start in range(0, len(texts), self.chunksize)]
+        return np.concatenate(list(self.get_executor().map(score_texts_in_worker, chunks)))
+
+    def label(self, texts):
+        return label_scores(self.score(texts))
+
+    def label_frame(self, df, text_field="text"):
+        labels = self.label(df[text_field].tolist())
+        labels.index = df.index
+        return pd.concat([labels, df.drop(columns=[column for column in LABEL_COLUMNS if column in df.columns])], axis=1)
+
+    def label_csv(self, csv_path, output_path, text_field="text", batch_rows=100000):
+        # Streams the CSV through the pool and appends every batch as a Parquet row group
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        stats = {"rows": 0}
+        start_time = time.time()
+        writer = None
+
+        try:
+            for chunk in pd.read_csv(csv_path, chunksize=batch_rows, dtype=str, keep_default_na=False):
+                table = pa.Table.from_pandas(self.label_frame(chunk, text_field), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+
+                stats["rows"] += len(chunk)
+                elapsed = time.time() - start_time
+                print(f"Labelled {stats['rows']} rows in {elapsed:.1f} sec ({stats['rows'] / max(elapsed, 1e-9):.0f} records/sec)")
+        finally:
+            if writer is not None:
+                writer.close()
+
+        stats["seconds"] = time.time() - start_time
+        stats["records_per_sec"] = stats["rows"] / max(stats["seconds"], 1e-9)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--output", required=True, help="Parquet file to write the labelled rows to")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=1000, help="Texts sent to a worker at a time")
+    parser.add_argument("--text-field", default="text")
+    args = parser.parse_args()
+
+    with LexiconLabeler(args.processes, args.chunksize) as labeler:
+        stats = labeler.label_csv(args.csv, args.output, args.text_field)
+    print(f"Wrote {stats['rows']} labelled rows to {args.output} in {stats['seconds']:.1f} sec ({stats['records_per_sec']:.0f} records/sec).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import json
+import os
+
+# Written by classification_utils.export once an exported model passed its accuracy check
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "exported_models.json")
+
+SEQUENCE_CLASSIFICATION = "sequence-classification"
+SEQ2SEQ = "seq2seq"
+
+FORMATS = ("quantized", "onnx", "onnx-int8")
+
+
+def load_registry(registry_path=REGISTRY_PATH):
+    if not os.path.exists(registry_path):
+        return {}
+
+    with open(registry_path, "r") as f:
+        return json.load(f)
+
+
+def save_registry(registry, registry_path=REGISTRY_PATH):
+    tmp_path = registry_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=4)
+    os.replace(tmp_path, registry_path)
+
+
+def register_export(model_key, entry, registry_path=REGISTRY_PATH):
+    registry = load_registry(registry_path)
+    registry[model_key] = entry
+    save_registry(registry, registry_path)
+
+
+def import_onnxruntime_models():
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    except ImportError:
+        raise ImportError("ONNX models need optimum with onnxruntime, install it with: pip install optimum[onnxruntime]")
+    return ORTModelForSequenceClassification, ORTModelForSeq2SeqLM
+
+
+def load_pretrained(model_name, task):
+    from transformers import AutoModelForSeq2SeqLM, AutoModelForSequenceClassification, AutoTokenizer
+
+    model_class = AutoModelForSeq2SeqLM if task == SEQ2SEQ else AutoModelForSequenceClassification
+    model = model_class.from_pretrained(model_name)
+    model.eval()
+    return AutoTokenizer.from_pretrained(model_name), model
+
+
+def load_export(entry, task):
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(entry["path"])
+
+    if entry["format"] == "quantized":
+        import torch
+
+        # Dynamically quantized modules are saved whole, they cannot be rebuilt from a config
+        model = torch.load(os.path.join(entry["path"], "model.pt"), weights_only=False)
+        model.eval()
+    else:
+        ORTModelForSequenceClassification, ORTModelForSeq2SeqLM = import_onnxruntime_models()
+        model_class = ORTModelForSeq2SeqLM if task == SEQ2SEQ else ORTModelForSequenceClassification
+        model = model_class.from_pretrained(entry["path"], file_name=entry.get("file_name"))
+
+    return tokenizer, model
+
+
+def load_model(model_key, model_name, task, variant="auto", registry_path=REGISTRY_PATH):
+    # The exported model when one was registered (and still exists), the original checkpoint otherwise.
+    # variant="fp32" always loads the original.
+    entry = load_registry(registry_path).get(model_key) if variant == "auto" else None
+
+    if entry and os.path.exists(entry["path"]):
+        print(f"Loading {entry['format']} export of {model_name} from {entry['path']}")
+        return load_export(entry, task)
+
+    return load_pretrained(model_name, task)
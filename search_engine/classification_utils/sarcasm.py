@@ -0,0 +1,89 @@
+# Sarcasm probability for many texts at once with the T5 model from sarcasm_detection.ipynb, run from the search_engine directory:
+#   python -m classification_utils.sarcasm --csv ../data/merged_all_new.csv --output ../data/sarcasm.csv
+#   python -m classification_utils.sarcasm --csv ../data/merged_all_new.csv --solr
+import argparse
+import os
+
+import numpy as np
+
+from classification_utils.batch_inference import BatchClassifier
+from classification_utils.model_registry import SEQ2SEQ
+
+SARCASM_MODEL = {
+    "name": "mrm8488/t5-base-finetuned-sarcasm-twitter",
+    "max_length": 512,
+    "label_field": "sarcasm_score",
+    "score_fields": []
+}
+
+# The words the model answers with, the notebook counted "derison" as sarcastic
+SARCASTIC_LABEL = "derison"
+NORMAL_LABEL = "normal"
+
+
+class SarcasmClassifier(BatchClassifier):
+    # Instead of generate() per text, one decoder step over a padded batch. The two answers start with different
+    # tokens, so the logits of those first tokens already decide which answer greedy generate() would give.
+    models = {"sarcasm": SARCASM_MODEL}
+    model_class = SEQ2SEQ
+
+    def __init__(self, batch_size=32, num_threads=None, buckets_per_window=32, variant="auto", tokenizer=None, model=None):
+        super().__init__("sarcasm", batch_size, num_threads, buckets_per_window, variant, tokenizer, model)
+
+        self.label_token_ids = [self.get_first_token_id(SARCASTIC_LABEL), self.get_first_token_id(NORMAL_LABEL)]
+        self.decoder_start_token_id = self.model.config.decoder_start_token_id
+
+    def get_first_token_id(self, word):
+        return self.tokenizer(word, add_special_tokens=False)["input_ids"][0]
+
+    def predict_scores(self, texts):
+        # Probability of the sarcastic answer for a list of texts, in input order
+        # The notebook appended "</s>" to every text, kept so the scores match its predictions
+        encodings = self.tokenizer([text + "</s>" for text in texts], max_length=self.model_config["max_length"], truncation=True)["input_ids"]
+
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i]))
+        scores = np.zeros(len(encodings), dtype=np.float32)
+
+        with self.torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_indices = order[start:start + self.batch_size]
+                batch = self.tokenizer.pad({"input_ids": [encodings[i] for i in batch_indices]}, return_tensors="pt")
+                decoder_input_ids = self.torch.full((len(batch_indices), 1), self.decoder_start_token_id, dtype=self.torch.long)
+
+                logits = self.model(**batch, decoder_input_ids=decoder_input_ids).logits[:, 0, self.label_token_ids]
+                scores[batch_indices] = self.torch.softmax(logits, dim=-1)[:, 0].numpy()
+
+        return scores
+
+    def get_fields(self, score):
+        return {self.model_config["label_field"]: float(score)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--output", help="CSV to write the rows with their sarcasm_score to")
+    parser.add_argument("--solr", action="store_true", help="Set sarcasm_score on the documents in the search_reddit core instead")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--variant", choices=["auto", "fp32"], default="auto", help="fp32 ignores any registered export")
+    parser.add_argument("--text-field", default="text")
+    args = parser.parse_args()
+
+    classifier = SarcasmClassifier(batch_size=args.batch_size, num_threads=args.threads, variant=args.variant)
+
+    if args.solr:
+        from solr_utils.ingest import BulkIngestor
+        from solr_utils.transport import SolrTransport
+
+        stats = classifier.classify_into_solr(args.csv, BulkIngestor(SolrTransport()), args.text_field)
+        print(f"Updated {stats['docs']} documents in {stats['seconds']:.1f} sec.")
+    elif args.output:
+        stats = classifier.classify_csv(args.csv, args.output, args.text_field)
+        print(f"Wrote {stats['rows']} scored rows to {args.output} in {stats['seconds']:.1f} sec.")
+    else:
+        parser.error("Give --output or --solr")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Where the crawler gets its data from: Reddit through praw, or a generated stand-in for offline runs and benchmarks
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+def make_praw_reddit():
+    import praw
+
+    # Credentials come from the environment, never from the code
+    return praw.Reddit(
+        client_id=os.environ["REDDIT_CLIENT_ID"],
+        client_secret=os.environ["REDDIT_CLIENT_SECRET"],
+        user_agent=os.environ.get("REDDIT_USER_AGENT", "search_reddit crawler"),
+        username=os.environ.get("REDDIT_USERNAME"),
+        password=os.environ.get("REDDIT_PASSWORD")
+    )
+
+
+class PrawBackend:
+    # Every method is one API request and returns plain lists, so the crawler can count and rate limit them
+    def __init__(self, make_reddit=make_praw_reddit):
+        self.make_reddit = make_reddit
+        self.local = threading.local()
+
+    @property
+    def reddit(self):
+        # praw.Reddit is not thread safe, each crawler worker thread gets its own on first use
+        if not hasattr(self.local, "reddit"):
+            self.local.reddit = self.make_reddit()
+        return self.local.reddit
+
+    def get_moderators(self, subreddit_name):
+        return [moderator.name for moderator in self.reddit.subreddit(subreddit_name).moderator()]
+
+    def get_posts(self, subreddit_name, limit=100, time_filter="all", search_term=None):
+        subreddit = self.reddit.subreddit(subreddit_name)
+        if search_term:
+            return list(subreddit.search(search_term, sort="relevance", limit=limit))
+        return list(subreddit.top(limit=limit, time_filter=time_filter))
+
+    def get_comments(self, post_id):
+        from praw.models import MoreComments
+
+        # Top level comments only, the "load more" stubs are skipped like the notebook did
+        return [comment for comment in self.reddit.submission(id=post_id).comments if not isinstance(comment, MoreComments)]
+
+
+class FakeRedditBackend:
+    # Generated subreddits with the attributes the crawler reads, and an optional delay per request to stand in for the API.
+    # Search results overlap with the top listing so deduplication has something to do.
+    # fail_after makes the request with that number raise, to try out resuming from the checkpoint.
+    def __init__(self, posts_per_subreddit=100, comments_per_post=20, latency=0.0, seed=0, fail_after=None):
+        self.posts_per_subreddit = posts_per_subreddit
+        self.comments_per_post = comments_per_post
+        self.latency = latency
+        self.seed = seed
+        self.fail_after = fail_after
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def request(self):
+        with self.lock:
+            self.requests += 1
+            if self.fail_after is not None and self.requests > self.fail_after:
+                raise ConnectionError(f"Fake backend failed on request {self.requests}")
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_rng(self, *key):
+        return random.Random(f"{self.seed}-" + "-".join(map(str, key)))
+
+    def get_moderators(self, subreddit_name):
+        self.request()
+        return [f"{subreddit_name}_mod"]
+
+    def make_post(self, subreddit_name, index):
+        rng = self.get_rng(subreddit_name, index)
+        post_id = f"{subreddit_name.lower()[:4]}{index:05d}"
+        return SimpleNamespace(
+            author=SimpleNamespace(name=f"{subreddit_name}_mod" if index % 25 == 0 else f"user{rng.randint(0, 999)}"),
+            author_flair_text=None, clicked=False, created_utc=1600000000.0 + index * 3600, distinguished=None, edited=False,
+            id=post_id, is_original_content=False, is_self=True, link_flair_text=None, locked=False, name=f"t3_{post_id}",
+            num_comments=self.comments_per_post, over_18=False, permalink=f"/r/{subreddit_name}/comments/{post_id}/",
+            saved=False, score=rng.randint(0, 5000), selftext="", spoiler=False, stickied=False,
+            title=f"Post {index} about electric cars in r/{subreddit_name}", upvote_ratio=round(rng.random(), 2),
+            url=f"https://www.reddit.com/r/{subreddit_name}/comments/{post_id}/"
+        )
+
+    def get_posts(self, subreddit_name, limit=100, time_filter="all", search_term=None):
+        self.request()
+        # A search returns every other top post, so a crawl of both sees each of those posts twice
+        step = 2 if search_term else 1
+        count = min(limit, self.posts_per_subreddit)
+        return [self.make_post(subreddit_name, index) for index in range(0, count * step, step) if index < self.posts_per_subreddit]
+
+    def get_comments(self, post_id):
+        self.request()
+        rng = self.get_rng(post_id)
+        comments = []
+        for index in range(self.comments_per_post):
+            comment_id = f"{post_id}c{index:03d}"
+            body = "[deleted]" if index % 17 == 16 else f"Comment {index} on {post_id}, range and charging are fine :)"
+            comments.append(SimpleNamespace(
+                author=SimpleNamespace(name=f"user{rng.randint(0, 999)}"), body=body, body_html=f"<p>{body}</p>",
+                created_utc=1600000000.0 + index * 60, distinguished=None, edited=False, id=comment_id, is_submitter=False,
+                link_id=f"t3_{post_id}", parent_id=f"t3_{post_id}", permalink=f"/r/fake/comments/{post_id}/{comment_id}/",
+                saved=False, score=rng.randint(-10, 500), stickied=False, subreddit_id="t5_fake"
+            ))
+        return comments
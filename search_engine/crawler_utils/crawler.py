@@ -0,0 +1,241 @@
+# Crawls subreddits into data/{subreddit}-posts.csv and -comments.csv like reddit-data-extraction.ipynb, with the comment
+# requests running concurrently under a shared rate limit. Run from the search_engine directory:
+#   python -m crawler_utils.crawler --subreddits BoltEV leaf --data-dir ../data
+#   python -m crawler_utils.crawler --search cars:ev --data-dir ../data --workers 8
+#   python -m crawler_utils.crawler --subreddits BoltEV --data-dir /tmp/fake-data --fake
+import argparse
+import csv
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from crawler_utils.backends import FakeRedditBackend, PrawBackend
+from crawler_utils.rate_limiter import TokenBucket
+
+POST_HEADERS = ['author', 'author_flair_text', 'clicked', 'created_utc', 'distinguished', 'edited', 'id', 'is_original_content',
+                'is_self', 'link_flair_text', 'locked', 'name', 'num_comments', 'over_18', 'permalink', 'saved', 'score', 'selftext',
+                'spoiler', 'stickied', 'subreddit_name', 'title', 'upvote_ratio', 'url']
+
+COMMENT_HEADERS = ['author', 'body', 'body_html', 'created_utc', 'distinguished', 'edited', 'id', 'is_submitter', 'link_id',
+                   'parent_id', 'permalink', 'saved', 'score', 'stickied', 'subreddit_name', 'subreddit_id']
+
+# Reddit's OAuth quota
+REQUESTS_PER_MINUTE = 100
+
+
+def get_author_name(item):
+    # Some accounts are deleted
+    return item.author.name if getattr(item, 'author', None) else '[deleted]'
+
+
+def get_value(item, header):
+    # Only missing values become empty cells, False, 0 and 0.0 (e.g. edited, score, upvote_ratio) are real values
+    value = getattr(item, header, None)
+    return '' if value is None else value
+
+
+def get_post_row(post, source_name):
+    row = {header: get_value(post, header) for header in POST_HEADERS}
+    row['author'] = get_author_name(post)
+    row['subreddit_name'] = source_name
+    return row
+
+
+def get_comment_row(comment, source_name):
+    import emoji
+
+    row = {header: get_value(comment, header) for header in COMMENT_HEADERS}
+    row['author'] = get_author_name(comment)
+    row['body'] = emoji.demojize(getattr(comment, 'body', 'None'))
+    row['body_html'] = emoji.demojize(getattr(comment, 'body_html', 'None'))
+    row['subreddit_name'] = source_name
+    return row
+
+
+def get_source_name(subreddit_name, search_term=None):
+    # Searches get their own files, like the notebook's "cars-ev"
+    return f"{subreddit_name}-{search_term}" if search_term else subreddit_name
+
+
+class RedditCrawler:
+    def __init__(self, backend, data_dir, max_workers=4, requests_per_minute=REQUESTS_PER_MINUTE, burst=10, checkpoint_path=None,
+                 limit=100, time_filter="all"):
+        self.backend = backend
+        self.data_dir = data_dir
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket.per_minute(requests_per_minute, burst)
+        self.checkpoint_path = checkpoint_path or os.path.join(data_dir, "crawl_checkpoint.json")
+        self.limit = limit
+        self.time_filter = time_filter
+
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+        os.makedirs(data_dir, exist_ok=True)
+        self.seen_post_ids = self.load_seen_ids("*-posts.csv")
+        self.seen_comment_ids = self.load_seen_ids("*-comments.csv")
+
+    def load_seen_ids(self, pattern):
+        # Everything already on disk counts as crawled, whichever run or search wrote it
+        ids = set()
+        for path in glob.glob(os.path.join(self.data_dir, pattern)):
+            if os.path.basename(path).startswith("all-"):
+                continue
+            ids.update(pd.read_csv(path, usecols=['id'], dtype=str, keep_default_na=False)['id'])
+        return ids
+
+    def count(self, key, value=1):
+        # Stats are updated from the worker threads too
+        with self.stats_lock:
+            self.stats[key] += value
+
+    def request(self, method, *args, **kwargs):
+        # Every backend call waits for a token first, however many threads are asking
+        self.count("rate_limited_seconds", self.rate_limiter.acquire())
+        self.count("requests")
+        return method(*args, **kwargs)
+
+    def get_csv_path(self, source_name, kind):
+        return os.path.join(self.data_dir, f"{source_name}-{kind}.csv")
+
+    def append_rows(self, path, headers, rows):
+        # Appends to what earlier runs wrote, the header only goes into a new file
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=headers)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as f:
+                return json.load(f)
+        return {"completed_sources": []}
+
+    def save_checkpoint(self, checkpoint):
+        # Write to a temporary file and swap it in so a crash never leaves a half written checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def fetch_comments(self, post, mod_names, source_name):
+        comments = self.request(self.backend.get_comments, post.id)
+
+        rows = []
+        for comment in comments:
+            # Skip mod comments (usually about rules) and deleted ones
+            if get_author_name(comment) in mod_names or comment.body in ('[deleted]', '[removed]'):
+                self.count("skipped_comments")
+                continue
+            rows.append(get_comment_row(comment, source_name))
+        return rows
+
+    def crawl_source(self, subreddit_name, search_term=None):
+        source_name = get_source_name(subreddit_name, search_term)
+        mod_names = set(self.request(self.backend.get_moderators, subreddit_name))
+        posts = self.request(self.backend.get_posts, subreddit_name, self.limit, self.time_filter, search_term)
+
+        new_posts = []
+        for post in posts:
+            # Skip mod posts, usually about rules etc
+            if get_author_name(post) in mod_names:
+                self.stats["skipped_mod_posts"] += 1
+            elif post.id in self.seen_post_ids:
+                self.stats["duplicate_posts"] += 1
+            else:
+                # Claimed now so the same post further down the listing is not fetched twice
+                self.seen_post_ids.add(post.id)
+                new_posts.append(post)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawl") as executor:
+            futures = {executor.submit(self.fetch_comments, post, mod_names, source_name): post for post in new_posts}
+            for future in as_completed(futures):
+                post = futures[future]
+                comment_rows = []
+                for row in future.result():
+                    if row['id'] in self.seen_comment_ids:
+                        self.stats["duplicate_comments"] += 1
+                        continue
+                    self.seen_comment_ids.add(row['id'])
+                    comment_rows.append(row)
+
+                # Comments before their post: once a post is in the CSV its comments are complete, so a resumed crawl can skip it
+                self.append_rows(self.get_csv_path(source_name, "comments"), COMMENT_HEADERS, comment_rows)
+                self.append_rows(self.get_csv_path(source_name, "posts"), POST_HEADERS, [get_post_row(post, source_name)])
+                self.stats["posts"] += 1
+                self.stats["comments"] += len(comment_rows)
+
+        print(f"Crawled {source_name}: {self.stats['posts']} posts and {self.stats['comments']} comments so far, "
+              f"{self.stats['requests']} requests in {time.time() - self.start_time:.1f} sec")
+
+    def crawl(self, sources):
+        # sources are (subreddit, search term or None) pairs. A crawl that stopped part way skips the sources it finished.
+        self.stats = {"posts": 0, "comments": 0, "skipped_mod_posts": 0, "skipped_comments": 0, "duplicate_posts": 0,
+                      "duplicate_comments": 0, "requests": 0, "rate_limited_seconds": 0.0, "skipped_sources": 0}
+        self.start_time = time.time()
+
+        checkpoint = self.load_checkpoint()
+        for subreddit_name, search_term in sources:
+            source_name = get_source_name(subreddit_name, search_term)
+            if source_name in checkpoint["completed_sources"]:
+                self.stats["skipped_sources"] += 1
+                continue
+
+            self.crawl_source(subreddit_name, search_term)
+            checkpoint["completed_sources"].append(source_name)
+            self.save_checkpoint(checkpoint)
+
+        # Crawl completed, nothing left to resume
+        self.clear_checkpoint()
+
+        self.stats["seconds"] = time.time() - self.start_time
+        return self.stats
+
+
+def parse_sources(subreddits, searches):
+    sources = [(subreddit_name, None) for subreddit_name in subreddits or []]
+    for search in searches or []:
+        subreddit_name, search_term = search.split(":", 1)
+        sources.append((subreddit_name, search_term))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subreddits", nargs="*", help="Top posts of these subreddits")
+    parser.add_argument("--search", nargs="*", help="subreddit:term searches, e.g. cars:ev")
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--limit", type=int, default=100, help="Posts per subreddit or search")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="Requests per minute")
+    parser.add_argument("--fake", action="store_true", help="Crawl the generated stand-in instead of Reddit")
+    parser.add_argument("--fake-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    sources = parse_sources(args.subreddits, args.search)
+    if not sources:
+        parser.error("Give --subreddits and/or --search")
+
+    backend = FakeRedditBackend(latency=args.fake_latency) if args.fake else PrawBackend()
+    crawler = RedditCrawler(backend, args.data_dir, max_workers=args.workers, requests_per_minute=args.rpm, limit=args.limit)
+    stats = crawler.crawl(sources)
+
+    print(f"Crawled {stats['posts']} posts and {stats['comments']} comments with {stats['requests']} requests in {stats['seconds']:.1f} sec "
+          f"({stats['rate_limited_seconds']:.1f} sec waiting for the rate limit). Skipped {stats['duplicate_posts']} duplicate posts, "
+          f"{stats['duplicate_comments']} duplicate comments, {stats['skipped_mod_posts']} mod posts and {stats['skipped_comments']} "
+          f"mod or deleted comments.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Reddit slang and internet abbreviations expanded to words, the replace_abbr of the preprocessing and classification notebooks
+import re
+
+ABBR_MAPPER = {
+    # Reddit abbreviations & Slangs
+    'Alt': 'Alternative Reddit account',
+    'AMA': 'Ask me anything',
+    'AMAA': 'Ask me almost anything',
+    'Benned': 'Banned',
+    'Brony': 'Male fan of My Little Pony',
+    'Cakeday': 'Birthday',
+    'Circlejerk': 'Elitist group',
+    'DAE': 'Does anyone else',
+    'Ent': 'Pot smoker',
+    'ETA': 'Edited to add',
+    'F7U12': 'FU',
+    'Fap': 'Masturbate',
+    '[FIXED]': 'Remix of an original post',
+    'FTA': 'From the article',
+    'FTFY': 'Fixed That For You',
+    'GW': 'Gone wild',
+    'Hivemind': 'Collective',
+    'IAMA': 'I Am A',
+    'IMO': 'In My Opinion',
+    'IMHO': 'In my honest opinion',
+    'IIRC': 'If i recall correctly',
+    'ITT': 'In this thread',
+    'Karma': 'Reddit score',
+    'Karmawhore': 'Desperate for reddit points',
+    'Meta-sub': 'Subreddits talking about Reddit',
+    'Meta-subreddits': 'Subreddits talking about Reddit',
+    'MIC': 'More in comments',
+    'Mod': 'Moderator',
+    'MRA': 'Mens rights activist',
+    'Neckbeard': 'Dirty reddit user',
+    'Ninjaedit': 'sneaky edit',
+    'Novelty account': 'joke account',
+    'NSFW': 'Not safe for work',
+    'NSFL': 'Not safe for life',
+    'OP': 'Original Poster',
+    'Orangered': 'Unread messages',
+    'Power user': 'User with high reddit score',
+    'Pun thread': 'Chain of punny comments',
+    'Reddiquette': 'Rules of reddit',
+    'RES': 'Reddit enhancement suite',
+    'RTFA': 'Read the fucking article',
+    'Shadow-ban': 'Silent ban',
+    'Shitpost': 'Trash post',
+    'Sockpuppet': 'Alternate reddit account',
+    'SJW': 'Social Justice Warrior',
+    'SRD': 'Subreddit drama',
+    'SRS': 'Shit reddit says',
+    'Sub': 'Subreddit',
+    'TIL': 'Today I learned',
+    'TL;DR': 'Too Long Didnt read',
+    'TLDR': 'Too Long Didnt read',
+    'WIP': 'Work in progress',
+    'X-post': 'Crosspost',
+    'Xpost': 'Crosspost',
+    'wh[o]+sh': 'Dont get the joke',
+
+    # Other common internet abbr & slangs
+    'LOL': 'Laugh out loud',
+    'TTYL': 'Talk to you later',
+    'ASAP': 'As soon as possible',
+    'FYI': 'For your information',
+    'JK': 'Just kidding',
+    'IDC': 'I dont care',
+    'FTW': 'For the win',
+    'LMAO': 'Laughing my ass off',
+    'LMFAO': 'Laughing my fucking ass off',
+    'BFF': 'Best friend forever',
+    'MFW': 'My face when',
+    'TFW': 'That feeling when',
+    'G2G': 'Got to go',
+    'MSG': 'Message',
+}
+
+
+def build_trie_pattern(keys):
+    # One alternation shaped like a trie of the keys (e.g. "ama" and "amaa" become ama(?:a)?), so the regex engine
+    # follows shared prefixes once instead of trying every key at every position. Longer keys are tried first.
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        group = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            return ("(?:" + group + ")?") if len(alternatives) == 1 else group + "?"
+        return group
+
+    return build(trie)
+
+
+class AbbreviationExpander:
+    # The whole mapping compiled once into a single regex, every abbreviation in a text is expanded in one scan.
+    # Keys are matched case-insensitively as whole words and literally (re.escape), like the notebook's pattern.
+    def __init__(self, mapper=ABBR_MAPPER):
+        self.lookup = {key.lower(): val for key, val in mapper.items()}
+        self.pattern = re.compile(r'\b(?:' + build_trie_pattern(self.lookup) + r')\b', re.IGNORECASE)
+
+    def replace(self, match):
+        return self.lookup[match.group(0).lower()]
+
+    def expand(self, text):
+        # Expanded text and the number of abbreviations replaced
+        return self.pattern.subn(self.replace, text)
+
+    def expand_batch(self, texts):
+        # Expanded texts in input order and the total number of replacements
+        expanded = []
+        total = 0
+        subn = self.pattern.subn
+        replace = self.replace
+        for text in texts:
+            text, count = subn(replace, text)
+            expanded.append(text)
+            total += count
+        return expanded, total
+
+
+expander = AbbreviationExpander()
+
+
+def replace_abbr(text):
+    return expander.expand(text)
@@ -0,0 +1,171 @@
+# English check of data-preprocessing-for-solr.ipynb (is_english) in three tiers: a cheap script/stopword check for the clear
+# cases, a cache of earlier langdetect results by content hash, and langdetect on a process pool for what is left.
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+LINK_PATTERN = re.compile(r'https?:\/\/.*[\r\n]*')
+DIGITS_PATTERN = re.compile(r'\d+')
+SYMBOLS_PATTERN = re.compile(r'[^\w\s]')
+
+# Common English function words, enough to recognise ordinary sentences without any NLTK data
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by can
+could did do does doing down during each few for from further had has have having he her here hers him his how i if in into
+is it its just me more most my no nor not now of off on once only or other our out over own same she should so some such than
+that the their them then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your
+""".split())
+
+# Tier names, also the keys of LanguageFilter.stats
+FAST_PATH = "fast_path"
+CACHE = "cache"
+DETECTED = "detected"
+
+
+def clean_text(text):
+    # Remove links, special characters, numbers, like is_english did before detection
+    text = LINK_PATTERN.sub('', text)
+    text = DIGITS_PATTERN.sub('', text)
+    return SYMBOLS_PATTERN.sub('', text)
+
+
+def fast_path(text, min_words=5, min_stopword_ratio=0.3, max_non_ascii_ratio=0.5):
+    # True or False when the answer is obvious from the text itself, None when langdetect has to decide
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        # langdetect finds no features and is_english keeps those (links, numbers, emojis, symbols)
+        return True
+
+    non_ascii_ratio = sum(not char.isascii() for char in letters) / len(letters)
+    if non_ascii_ratio > max_non_ascii_ratio:
+        # Mostly another script (CJK, Cyrillic, ...)
+        return False
+
+    words = text.lower().split()
+    if non_ascii_ratio == 0:
+        # Too short for langdetect to be any good ("Nice", "Yes!", "I love it!"), in an English subreddit these are English
+        if len(words) < min_words:
+            return True
+        if sum(word in ENGLISH_STOPWORDS for word in words) / len(words) >= min_stopword_ratio:
+            return True
+
+    return None
+
+
+def detect_english(text):
+    from langdetect import detect
+    from langdetect.lang_detect_exception import LangDetectException
+
+    try:
+        return detect(text) == 'en'
+    except LangDetectException:
+        # No language detected, most of the time are links, numbers, emojis, symbols
+        return True
+
+
+def init_worker():
+    from langdetect import DetectorFactory
+
+    # Set seed for reproducibility
+    DetectorFactory.seed = 0
+
+
+def detect_english_batch(texts):
+    return [detect_english(text) for text in texts]
+
+
+def get_text_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class LanguageFilter:
+    def __init__(self, processes=None, cache_path=None, chunksize=256, min_pool_size=64):
+        self.processes = processes or os.cpu_count()
+        self.cache_path = cache_path
+        self.chunksize = chunksize
+        # Fewer ambiguous texts than this are detected in this process, a pool round trip is not worth it
+        self.min_pool_size = min_pool_size
+        self.executor = None
+
+        # Content hash of the cleaned text -> langdetect's answer, only ambiguous texts ever get here
+        self.cache = self.load_cache()
+        self.stats = {FAST_PATH: 0, CACHE: 0, DETECTED: 0}
+
+    def load_cache(self):
+        if self.cache_path and os.path.exists(self.cache_path):
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+
+        # Write to a temporary file and swap it in so a crash never leaves a half written cache
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes, initializer=init_worker)
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.save_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def detect(self, texts):
+        if self.processes < 2 or len(texts) < self.min_pool_size:
+            init_worker()
+            return detect_english_batch(texts)
+
+        chunks = [texts[start:start + self.chunksize] for start in range(0, len(texts), self.chunksize)]
+        return [result for results in self.get_executor().map(detect_english_batch, chunks) for result in results]
+
+    def is_english_batch(self, texts):
+        # One bool per text, in input order
+        results = [None] * len(texts)
+        pending = {}
+
+        for i, text in enumerate(texts):
+            text = clean_text(text)
+            result = fast_path(text)
+            if result is not None:
+                self.stats[FAST_PATH] += 1
+                results[i] = result
+                continue
+
+            text_hash = get_text_hash(text)
+            if text_hash in self.cache:
+                self.stats[CACHE] += 1
+                results[i] = self.cache[text_hash]
+            else:
+                # Duplicates inside the batch are detected once
+                pending.setdefault(text_hash, (text, []))[1].append(i)
+
+        if pending:
+            detected = self.detect([text for text, _ in pending.values()])
+            for (text_hash, (_, indices)), result in zip(pending.items(), detected):
+                self.cache[text_hash] = result
+                self.stats[DETECTED] += 1
+                self.stats[CACHE] += len(indices) - 1
+                for i in indices:
+                    results[i] = result
+
+        return results
+
+    def is_english(self, text):
+        return self.is_english_batch([text])[0]
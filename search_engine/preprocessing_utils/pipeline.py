@@ -0,0 +1,288 @@
+# The cleaning steps of data-preprocessing-for-solr.ipynb as one streaming pipeline, run from the search_engine directory:
+#   python -m preprocessing_utils.pipeline --posts ../data/all-posts.csv --comments ../data/all-comments.csv --output ../data/cleaned_combined_data.csv
+#   python -m preprocessing_utils.pipeline --posts ../data/all-posts.csv --comments ../data/all-comments.csv --solr
+# Rows langdetect calls non-English are kept and only counted, like the notebook left them for manual review.
+# --review-output writes them out for that review, --drop-non-english leaves them out.
+import argparse
+import csv
+import datetime
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from preprocessing_utils.abbreviations import replace_abbr
+from preprocessing_utils.language_filter import LanguageFilter
+from storage_utils.store import NULL_VALUES
+
+# Source column -> output column, the columns the notebook kept
+POST_COLUMNS = {
+    "author": "author", "title": "text", "created_utc": "created_utc", "edited": "edited", "id": "id", "num_comments": "num_comments",
+    "permalink": "permalink", "score": "upvote", "subreddit_name": "subreddit_name", "upvote_ratio": "upvote_ratio", "url": "url"
+}
+COMMENT_COLUMNS = {
+    "author": "author", "body": "text", "created_utc": "created_utc", "edited": "edited", "id": "id", "permalink": "permalink",
+    "score": "upvote", "subreddit_name": "subreddit_name", "link_id": "post_id"
+}
+
+# Same column order as cleaned_combined_data.csv
+OUTPUT_COLUMNS = ["author", "text", "created_utc", "edited", "id", "num_comments", "permalink", "upvote", "subreddit_name",
+                  "upvote_ratio", "url", "type", "post_id", "text_spellcheck"]
+
+BOT_AUTHORS = frozenset([
+    'Decronym', 'stabbot', 'stabbot_crop', 'DeepFryBot', 'gifreversingbot', 'vredditshare', 'VredditDownloader', 'morejpeg_auto',
+    'gifendore', 'r2tg_bot', 'WololoBot', 'tippr', 'RemindMeBot', 'profanitycounter', 'Eminem_Bot'
+])
+
+TIMEZONE = ZoneInfo('Asia/Singapore')
+
+SPACES_PATTERN = re.compile(r'\s+')
+
+# How the crawler CSVs spell a missing timestamp, edited is also False for comments that were never edited
+EMPTY_DATETIMES = NULL_VALUES | {"False"}
+
+
+def convert_datetime(value):
+    # Unix timestamps to Singapore time, formatted like the notebook did. Empty (never edited) values stay empty.
+    if value is None or value in EMPTY_DATETIMES:
+        return ""
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        return value
+    if timestamp != timestamp:
+        return ""
+    return datetime.datetime.fromtimestamp(timestamp, tz=TIMEZONE).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def remove_multiple_spaces(text):
+    # Also remove multiple tabs, newlines, whitespaces
+    cleaned_text, num_substitutions = SPACES_PATTERN.subn(' ', text)
+    return cleaned_text, num_substitutions - 1
+
+
+def new_stats():
+    return {"rows": 0, "kept": 0, "bots": 0, "empty": 0, "non_english": 0, "non_english_dropped": 0, "spaces_removed": 0, "abbreviations": 0,
+            "total_words": 0}
+
+
+def is_candidate(record):
+    # Bots and empty texts are dropped anyway, no need to check their language. text is required by the schema.
+    return record.get("author") not in BOT_AUTHORS and bool(record.get("text", "").strip())
+
+
+def preprocess_record(record, stats, vocabulary, english=True, drop_non_english=False):
+    # Every step of the notebook on one record in a single pass, None when the record is dropped.
+    # english comes from the LanguageFilter, which runs before the records are handed to the workers. langdetect is unreliable on
+    # short replies ("Nice", "Yes!"), so non-English rows are only dropped when asked to.
+    stats["rows"] += 1
+    text = record.get("text", "")
+
+    if record.get("author") in BOT_AUTHORS:
+        stats["bots"] += 1
+        return None
+    if not text.strip():
+        stats["empty"] += 1
+        return None
+    if not english:
+        stats["non_english"] += 1
+        if drop_non_english:
+            stats["non_english_dropped"] += 1
+            return None
+
+    text, num_spaces = remove_multiple_spaces(text)
+    text, num_abbr = replace_abbr(text)
+    stats["spaces_removed"] += num_spaces
+    stats["abbreviations"] += num_abbr
+
+    words = text.split()
+    stats["total_words"] += len(words)
+    vocabulary.update(word.lower() for word in words)
+
+    record["text"] = text
+    record["text_spellcheck"] = text
+    record["created_utc"] = convert_datetime(record.get("created_utc", ""))
+    record["edited"] = convert_datetime(record.get("edited", ""))
+
+    stats["kept"] += 1
+    return {column: record.get(column, "") for column in OUTPUT_COLUMNS}
+
+
+def preprocess_chunk(records, english_flags=None, drop_non_english=False):
+    # Runs in the pool workers, only the kept rows, counts and words seen in this chunk go back
+    english_flags = english_flags or [True] * len(records)
+    stats = new_stats()
+    vocabulary = set()
+    rows = []
+    for record, english in zip(records, english_flags):
+        row = preprocess_record(record, stats, vocabulary, english, drop_non_english)
+        if row is not None:
+            rows.append(row)
+    return rows, stats, vocabulary
+
+
+class PreprocessingPipeline:
+    def __init__(self, processes=None, chunk_rows=5000, check_language=True, language_cache_path=None, drop_non_english=False,
+                 review_path=None):
+        self.processes = processes or os.cpu_count()
+        self.chunk_rows = chunk_rows
+        self.language_filter = LanguageFilter(self.processes, language_cache_path) if check_language else None
+        self.drop_non_english = drop_non_english
+        # CSV of the rows flagged as non-English, for manual review
+        self.review_path = review_path
+        # Chunks waiting or in work, memory is bounded by this many chunks whatever the input size
+        self.max_in_flight = self.processes * 2
+
+    def read_chunks(self, csv_path, columns, type):
+        # Only the used columns are read, as strings so ids and timestamps come through unchanged
+        for chunk in pd.read_csv(csv_path, chunksize=self.chunk_rows, usecols=list(columns), dtype=str, keep_default_na=False):
+            chunk = chunk.rename(columns=columns)
+            chunk["type"] = type
+            yield chunk.to_dict("records")
+
+    def read_inputs(self, posts_path=None, comments_path=None):
+        # Posts first then comments, same order as the notebook's concat
+        if posts_path:
+            yield from self.read_chunks(posts_path, POST_COLUMNS, "post")
+        if comments_path:
+            yield from self.read_chunks(comments_path, COMMENT_COLUMNS, "comment")
+
+    def get_english_flags(self, records):
+        if self.language_filter is None:
+            return None
+
+        indices = [i for i, record in enumerate(records) if is_candidate(record)]
+        flags = [True] * len(records)
+        for i, english in zip(indices, self.language_filter.is_english_batch([records[i]["text"] for i in indices])):
+            flags[i] = english
+
+        if self.review_path:
+            self.write_review_rows([record for record, english in zip(records, flags) if not english])
+        return flags
+
+    def write_review_rows(self, records):
+        write_header = not os.path.exists(self.review_path) or os.path.getsize(self.review_path) == 0
+        with open(self.review_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["id", "type", "subreddit_name", "text"], extrasaction="ignore")
+            if write_header:
+                writer.writeheader()
+            writer.writerows(records)
+
+    def process(self, posts_path=None, comments_path=None, stats=None):
+        # Yields batches of cleaned rows in input order. stats (a dict) is filled in as the batches come back.
+        stats = stats if stats is not None else {}
+        stats.update(new_stats())
+        vocabulary = set()
+        if self.review_path and os.path.exists(self.review_path):
+            # A fresh review file for every run
+            os.remove(self.review_path)
+        start_time = time.time()
+
+        def collect(result):
+            rows, chunk_stats, chunk_vocabulary = result
+            for key, value in chunk_stats.items():
+                stats[key] += value
+            vocabulary.update(chunk_vocabulary)
+            stats["unique_words"] = len(vocabulary)
+
+            elapsed = time.time() - start_time
+            print(f"Preprocessed {stats['rows']} rows, kept {stats['kept']}, in {elapsed:.1f} sec ({stats['rows'] / max(elapsed, 1e-9):.0f} rows/sec)")
+            return rows
+
+        chunks = self.read_inputs(posts_path, comments_path)
+        try:
+            if self.processes < 2:
+                for records in chunks:
+                    yield collect(preprocess_chunk(records, self.get_english_flags(records), self.drop_non_english))
+            else:
+                # The language of the next chunk is checked while the workers clean the previous ones
+                with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                    in_flight = deque()
+                    for records in chunks:
+                        in_flight.append(executor.submit(preprocess_chunk, records, self.get_english_flags(records), self.drop_non_english))
+                        if len(in_flight) >= self.max_in_flight:
+                            yield collect(in_flight.popleft().result())
+                    while in_flight:
+                        yield collect(in_flight.popleft().result())
+        finally:
+            # Keeps the langdetect results for the next run
+            if self.language_filter is not None:
+                stats["language_tiers"] = dict(self.language_filter.stats)
+                self.language_filter.close()
+
+        stats["seconds"] = time.time() - start_time
+
+    def to_csv(self, output_path, posts_path=None, comments_path=None):
+        stats = {}
+        header = True
+        for rows in self.process(posts_path, comments_path, stats):
+            pd.DataFrame(rows, columns=OUTPUT_COLUMNS).to_csv(output_path, mode="w" if header else "a", header=header, index=False,
+                                                             encoding="utf-8")
+            header = False
+        return stats
+
+    def to_solr(self, ingestor, posts_path=None, comments_path=None):
+        # Straight into the index through the bulk ingestor, empty cells dropped like BulkIngestor.read_csv_batches does
+        stats = {}
+
+        def docs():
+            for rows in self.process(posts_path, comments_path, stats):
+                for row in rows:
+                    yield {key: value for key, value in row.items() if value != ""}
+
+        stats["ingest"] = ingestor.ingest_docs(docs())
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", help="all-posts.csv")
+    parser.add_argument("--comments", help="all-comments.csv")
+    parser.add_argument("--output", help="CSV to write the cleaned rows to")
+    parser.add_argument("--solr", action="store_true", help="Send the cleaned rows to the search_reddit core instead")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--skip-language", action="store_true", help="Skip language detection")
+    parser.add_argument("--drop-non-english", action="store_true", help="Leave out the rows langdetect calls non-English")
+    parser.add_argument("--review-output", help="CSV to write the rows flagged as non-English to, for manual review")
+    parser.add_argument("--language-cache", help="JSON file that keeps langdetect results between runs")
+    args = parser.parse_args()
+
+    if not args.posts and not args.comments:
+        parser.error("Give --posts and/or --comments")
+
+    if args.skip_language and (args.drop_non_english or args.review_output):
+        parser.error("--drop-non-english and --review-output need language detection")
+
+    pipeline = PreprocessingPipeline(args.processes, args.chunk_rows, check_language=not args.skip_language,
+                                     language_cache_path=args.language_cache, drop_non_english=args.drop_non_english,
+                                     review_path=args.review_output)
+
+    if args.solr:
+        from solr_utils.ingest import BulkIngestor
+        from solr_utils.transport import SolrTransport
+
+        stats = pipeline.to_solr(BulkIngestor(SolrTransport()), args.posts, args.comments)
+    elif args.output:
+        stats = pipeline.to_csv(args.output, args.posts, args.comments)
+    else:
+        parser.error("Give --output or --solr")
+
+    print(f"Kept {stats['kept']} of {stats['rows']} rows in {stats['seconds']:.1f} sec: {stats['bots']} bot, {stats['non_english_dropped']} "
+          f"non-English and {stats['empty']} empty rows dropped, {stats['spaces_removed']} whitespace runs and {stats['abbreviations']} "
+          f"abbreviations replaced.")
+    if not args.skip_language:
+        print(f"{stats['non_english']} rows flagged as non-English" + (f", written to {args.review_output} for review" if args.review_output else ""))
+    if "language_tiers" in stats:
+        tiers = stats["language_tiers"]
+        print(f"Language checked by fast path for {tiers['fast_path']}, from cache for {tiers['cache']} and by langdetect for {tiers['detected']} rows.")
+    print(f"Number of total words: {stats['total_words']}")
+    print(f"Number of unique words: {stats.get('unique_words', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+from solr_utils.queries import QUERY_PATH
+
+
+class DeltaSync:
+    def __init__(self, ingestor, manifest_path):
+        self.ingestor = ingestor
+        self.manifest_path = manifest_path
+
+    @staticmethod
+    def get_row_hash(row):
+        # Covers every column, so an edit, a new upvote count or a relabel all count as a change
+        return hashlib.sha1(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def read_csv_rows(self, csv_path):
+        for batch in self.ingestor.read_csv_batches(csv_path, drop_empty=False):
+            for row in batch:
+                if row.get("id"):
+                    yield row
+
+    @staticmethod
+    def get_csv_stamp(csv_path):
+        # Size and modification time, enough to tell the CSV was rewritten without reading it
+        stat = os.stat(csv_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def read_manifest_file(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        # Manifests written before the CSV stamp was kept are the bare id -> hash mapping
+        if "rows" not in manifest:
+            manifest = {"csv": None, "rows": manifest}
+        return manifest
+
+    def load_manifest(self):
+        manifest = self.read_manifest_file()
+        return manifest["rows"] if manifest is not None else None
+
+    def save_manifest(self, manifest, csv_stamp=None):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"csv": csv_stamp, "rows": manifest}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def write_manifest(self, csv_path):
+        # After a full ingest, everything in the CSV is what is indexed
+        csv_stamp = self.get_csv_stamp(csv_path)
+        self.save_manifest({row["id"]: self.get_row_hash(row) for row in self.read_csv_rows(csv_path)}, csv_stamp)
+
+    def needs_sync(self, csv_path):
+        # True when the CSV changed since the last ingest or sync, or that is not known
+        manifest = self.read_manifest_file()
+        return manifest is None or manifest["csv"] != self.get_csv_stamp(csv_path)
+
+    def fetch_indexed_ids(self, page_size=10000):
+        # Only used when there is no manifest yet, walks every id in the core with a cursor
+        ids = set()
+        cursor_mark = "*"
+
+        while True:
+            params = {"q": "*:*", "fl": "id", "sort": "id asc", "rows": page_size, "cursorMark": cursor_mark}
+            response = self.ingestor.transport.get(QUERY_PATH, params=params, timeout=self.ingestor.timeout)
+            response.raise_for_status()
+            response_json = response.json()
+
+            ids.update(doc["id"] for doc in response_json["response"]["docs"])
+            if response_json["nextCursorMark"] == cursor_mark:
+                return ids
+            cursor_mark = response_json["nextCursorMark"]
+
+    @staticmethod
+    def get_atomic_update(row):
+        # Set every field of a changed document in place, emptied fields are removed
+        update = {"id": row["id"]}
+        for key, value in row.items():
+            if key != "id":
+                update[key] = {"set": value if value != "" else None}
+        return update
+
+    def sync_csv(self, csv_path):
+        # Stamped before reading, a CSV rewritten while the sync runs is synced again next time
+        csv_stamp = self.get_csv_stamp(csv_path)
+        manifest = self.load_manifest()
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "deleted": 0}
+        new_manifest = {}
+
+        if manifest is None:
+            # Rows already in the index go in as atomic updates below, which keeps the fields that only atomic updates
+            # wrote (sarcasm_score, the classifier scores) instead of overwriting the whole documents
+            print("No ingest manifest found, comparing against the ids in the index.")
+            indexed_ids = self.fetch_indexed_ids()
+            manifest = {}
+        else:
+            indexed_ids = set(manifest.keys())
+
+        def get_changed_docs():
+            for row in self.read_csv_rows(csv_path):
+                row_hash = self.get_row_hash(row)
+                new_manifest[row["id"]] = row_hash
+                old_hash = manifest.get(row["id"])
+
+                if old_hash == row_hash:
+                    stats["unchanged"] += 1
+                elif old_hash is None and row["id"] not in indexed_ids:
+                    stats["new"] += 1
+                    yield {key: value for key, value in row.items() if value != ""}
+                else:
+                    stats["changed"] += 1
+                    yield self.get_atomic_update(row)
+
+        self.ingestor.ingest_batches(self.ingestor.chunk_docs(get_changed_docs()))
+
+        deleted_ids = [doc_id for doc_id in indexed_ids if doc_id not in new_manifest]
+        self.ingestor.send_deletes(deleted_ids)
+        stats["deleted"] = len(deleted_ids)
+
+        self.ingestor.commit()
+
+        # Only saved once Solr has acknowledged everything, a failed sync is simply redone next time
+        self.save_manifest(new_manifest, csv_stamp)
+
+        return stats
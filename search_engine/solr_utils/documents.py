@@ -0,0 +1,37 @@
+import datetime
+
+
+def first_value(value):
+    # Fields indexed schemaless come back as lists, single valued schema fields as plain values
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def parse_solr_date(value):
+    # Solr dates look like 2023-05-01T12:34:56Z, sometimes with milliseconds
+    if not value:
+        return None
+    return datetime.datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S")
+
+
+class RedditDoc:
+    # One search result with single values, kept instead of the raw Solr JSON in session_state.
+    # __slots__ keeps every instance free of a per-object __dict__.
+    __slots__ = ("id", "type", "post_id", "author", "subreddit_name", "upvote", "created_utc", "permalink",
+                 "vader_sentiment", "vader_subjectivity", "textblob_sentiment", "textblob_subjectivity", "label",
+                 "text", "highlight")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_solr(cls, doc, highlight=None):
+        fields = {name: first_value(doc.get(name)) for name in cls.__slots__ if name in doc}
+        fields["created_utc"] = parse_solr_date(fields.get("created_utc"))
+        fields["highlight"] = highlight
+        return cls(**fields)
+
+    def __repr__(self):
+        return f"RedditDoc(id={self.id!r}, type={self.type!r}, author={self.author!r})"
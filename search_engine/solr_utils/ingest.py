@@ -0,0 +1,178 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from solr_utils.queries import UPDATE_PATH
+
+
+class BulkIngestor:
+    def __init__(self, transport, batch_size=5000, max_workers=4, commit_within=10000, checkpoint_path=None, timeout=120):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.commit_within = commit_within
+        self.checkpoint_path = checkpoint_path
+        self.timeout = timeout
+
+    def read_csv_batches(self, csv_path, drop_empty=True):
+        # Read the CSV in chunks as strings and let Solr convert by field type, like the CSV handler did.
+        # Empty cells are dropped since Solr cannot parse "" into numeric/date fields.
+        for chunk in pd.read_csv(csv_path, chunksize=self.batch_size, dtype=str, keep_default_na=False):
+            rows = chunk.to_dict("records")
+            if drop_empty:
+                rows = [{key: value for key, value in row.items() if value != ""} for row in rows]
+            yield rows
+
+    def chunk_docs(self, docs):
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def send_batch(self, docs):
+        # commitWithin lets Solr fold the batches into few soft commits, the hard commit happens once at the end
+        response = self.transport.post(UPDATE_PATH, params={"commitWithin": self.commit_within}, json=docs, timeout=self.timeout)
+        response.raise_for_status()
+        return len(docs)
+
+    def send_deletes(self, ids):
+        for batch in self.chunk_docs(ids):
+            response = self.transport.post(UPDATE_PATH, params={"commitWithin": self.commit_within}, json={"delete": batch},
+                                           timeout=self.timeout)
+            response.raise_for_status()
+
+    def commit(self):
+        response = self.transport.get(UPDATE_PATH, params={"commit": "true"}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def ingest_batches(self, batches, acked_batches=None, on_ack=None):
+        # Sends batches from a bounded pool, at most 2 batches per worker are read ahead to keep memory flat
+        acked_batches = acked_batches or set()
+        max_in_flight = self.max_workers * 2
+        stats = {"docs": 0, "batches": 0, "skipped_batches": 0}
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+
+            def collect(done):
+                error = None
+                for future in done:
+                    batch_index = in_flight.pop(future)
+                    if future.exception():
+                        error = error or future.exception()
+                        continue
+
+                    stats["docs"] += future.result()
+                    stats["batches"] += 1
+                    if on_ack:
+                        on_ack(batch_index)
+
+                # Raised after acknowledging the batches that did succeed, so they stay in the checkpoint
+                if error:
+                    raise error
+
+                elapsed = time.time() - start_time
+                print(f"Ingested {stats['docs']} docs in {elapsed:.1f} sec ({stats['docs'] / max(elapsed, 1e-9):.0f} docs/sec)")
+
+            try:
+                for batch_index, docs in enumerate(batches):
+                    if batch_index in acked_batches:
+                        stats["skipped_batches"] += 1
+                        continue
+
+                    in_flight[executor.submit(self.send_batch, docs)] = batch_index
+                    if len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        stats["seconds"] = time.time() - start_time
+        stats["docs_per_sec"] = stats["docs"] / max(stats["seconds"], 1e-9)
+        return stats
+
+    def ingest_docs(self, docs):
+        # For documents that do not come from a CSV (e.g. delta sync, classification output), no checkpointing
+        stats = self.ingest_batches(self.chunk_docs(docs))
+        self.commit()
+        return stats
+
+    def ingest_csv(self, csv_path, resume=True):
+        if not resume:
+            self.clear_checkpoint()
+
+        checkpoint = self.load_checkpoint(csv_path)
+        acked_batches = set(checkpoint["acked_batches"])
+
+        if acked_batches:
+            print(f"Resuming ingest, skipping {len(acked_batches)} acknowledged batches.")
+
+        # Saved before the first batch so a load that dies early is still detected as interrupted
+        self.save_checkpoint(checkpoint)
+
+        def on_ack(batch_index):
+            checkpoint["acked_batches"].append(batch_index)
+            self.save_checkpoint(checkpoint)
+
+        stats = self.ingest_batches(self.read_csv_batches(csv_path), acked_batches, on_ack)
+        self.commit()
+
+        # Load completed, nothing left to resume
+        self.clear_checkpoint()
+
+        return stats
+
+    def new_checkpoint(self, csv_path):
+        # The checkpoint is only valid for the same file content and batch layout
+        return {
+            "csv_path": os.path.abspath(csv_path),
+            "csv_size": os.path.getsize(csv_path),
+            "csv_mtime": os.path.getmtime(csv_path),
+            "batch_size": self.batch_size,
+            "acked_batches": []
+        }
+
+    def load_checkpoint(self, csv_path):
+        checkpoint = self.new_checkpoint(csv_path)
+
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as f:
+                saved = json.load(f)
+
+            if all(saved.get(key) == value for key, value in checkpoint.items() if key != "acked_batches"):
+                checkpoint["acked_batches"] = saved["acked_batches"]
+            else:
+                print("Ingest checkpoint does not match the CSV file, starting from the beginning.")
+
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint):
+        if not self.checkpoint_path:
+            return
+
+        # Write to a temporary file and swap it in so a crash never leaves a half written checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def has_checkpoint(self):
+        return bool(self.checkpoint_path) and os.path.exists(self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if self.has_checkpoint():
+            os.remove(self.checkpoint_path)
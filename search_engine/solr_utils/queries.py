@@ -0,0 +1,257 @@
+# Request builders and response parsers used by SolrManager
+import json
+from collections import Counter
+
+from solr_utils.documents import RedditDoc
+
+QUERY_PATH = "/solr/search_reddit/query"
+UPDATE_PATH = "/solr/search_reddit/update"
+ANALYSIS_PATH = "/solr/search_reddit/analysis/field"
+
+# Label fields faceted for the Text Analysis tab, and the model prefix each one is reported under
+LABEL_FACET_FIELDS = {
+    "vader_sentiment": "vader",
+    "vader_subjectivity": "vader",
+    "textblob_sentiment": "textblob",
+    "textblob_subjectivity": "textblob",
+    "label": "roberta"
+}
+
+# Snippets are marked up like utils.bold_matching_words did
+HIGHLIGHT_PRE = '<strong style="color: DodgerBlue;">'
+HIGHLIGHT_POST = "</strong>"
+HIGHLIGHT_FRAGSIZE = 300
+
+# Comments fetched per post and row when they cannot be grouped by post in Solr
+UNGROUPED_ROWS_FACTOR = 5
+HIGHLIGHT_SNIPPETS = 3
+
+# What the result cards and the analysis tab need, the full text only when there are no highlighted snippets
+DISPLAY_FIELDS = "id,type,post_id,author,subreddit_name,upvote,created_utc,permalink," + ",".join(LABEL_FACET_FIELDS)
+DISPLAY_FIELDS_WITH_TEXT = DISPLAY_FIELDS + ",text"
+
+# Sidebar choices for the sarcasm filter, documents without a sarcasm_score count as not sarcastic
+SARCASM_THRESHOLD = 0.5
+SARCASM_FILTERS = {
+    "hide": f"-sarcasm_score:[{SARCASM_THRESHOLD} TO *]",
+    "only": f"sarcasm_score:[{SARCASM_THRESHOLD} TO *]"
+}
+
+# Top terms of text_terms under every label bucket, these feed the word clouds
+WORD_CLOUD_TERMS = 100
+
+LABEL_FACETS = json.dumps({
+    field: {
+        "type": "terms",
+        "field": field,
+        "facet": {"terms": {"type": "terms", "field": "text_terms", "limit": WORD_CLOUD_TERMS}}
+    }
+    for field in LABEL_FACET_FIELDS
+})
+
+
+def escape_phrase(text):
+    # Inside a quoted phrase only backslashes and double quotes are special
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def build_date_filter(date_range):
+    # Whole days, rounded with date math so the same range always gives the same filterCache entry
+    return f"created_utc:[{date_range[0]}T00:00:00Z/DAY TO {date_range[1]}T00:00:00Z/DAY+1DAY}}"
+
+
+def build_filters(type, date_range=None, sarcasm=None):
+    # Type, date and sarcasm are unscored filters, each cached by Solr independently of the text
+    filters = ["{!term f=type}" + type]
+    if date_range:
+        filters.append(build_date_filter(date_range))
+    if sarcasm:
+        filters.append(SARCASM_FILTERS[sarcasm])
+    return filters
+
+
+def build_highlight_params(fragsize=HIGHLIGHT_FRAGSIZE):
+    # Unified highlighter on text, docs without a match (e.g. comments) still get their first fragment
+    return {
+        "hl": "true",
+        "hl.method": "unified",
+        "hl.fl": "text",
+        "hl.fragsize": fragsize,
+        "hl.snippets": HIGHLIGHT_SNIPPETS,
+        "hl.tag.pre": HIGHLIGHT_PRE,
+        "hl.tag.post": HIGHLIGHT_POST,
+        "hl.defaultSummary": "true"
+    }
+
+
+def build_text_query_params(text, type, date_range=None, num_rows=10, phrase_search=False, facets=False, spellcheck=False,
+                            highlight=False, fragsize=HIGHLIGHT_FRAGSIZE, cursor_mark=None, sarcasm=None):
+    # Only the user text is scored, edismax parses it safely (no field access, no syntax errors)
+    # and every word has to match, like the AND-joined query used to
+    params = {
+        "defType" : "edismax",
+        "q" : f'"{escape_phrase(text)}"' if phrase_search else text,
+        "qf" : "text",
+        "q.op" : "AND",
+        "mm" : "100%",
+        "uf" : "-*",
+        "fq" : build_filters(type, date_range, sarcasm),
+        "rows" : num_rows,
+        "fl" : DISPLAY_FIELDS if highlight else DISPLAY_FIELDS_WITH_TEXT,
+        # id breaks upvote ties, cursor paging needs a total order
+        "sort": "upvote desc, id asc"
+    }
+
+    # Pages after the first continue from the previous page's nextCursorMark
+    if cursor_mark:
+        params["cursorMark"] = cursor_mark
+
+    # Label counts over every matching document, computed by Solr in the same request
+    if facets:
+        params["json.facet"] = LABEL_FACETS
+
+    if highlight:
+        params.update(build_highlight_params(fragsize))
+
+    # Suggestions come back with the results, but only when there are fewer hits than rows.
+    # Solr tries the collations against the index with the same filters and only keeps ones that return hits.
+    if spellcheck:
+        params.update({
+            "spellcheck": "true",
+            "spellcheck.q": text,
+            "spellcheck.maxResultsForSuggest": num_rows,
+            "spellcheck.count": 10,
+            "spellcheck.alternativeTermCount": 5,
+            "spellcheck.collate": "true",
+            "spellcheck.collateExtendedResults": "true",
+            "spellcheck.maxCollationTries": 10,
+            "spellcheck.maxCollations": 1
+        })
+
+    return params
+
+
+def build_comments_from_post_ids_params(post_ids, num_rows=10, facets=False, highlight_text=None, fragsize=HIGHLIGHT_FRAGSIZE,
+                                        sarcasm=None, grouped=True):
+    # Reddit uses id with "t3_" prefix to indicate post_id globally
+    params = {
+        "q" : "*:*",
+        "fq" : build_filters("comment", sarcasm=sarcasm) + ["{!terms f=post_id}" + ",".join(f"t3_{post_id}" for post_id in post_ids)],
+        "rows" : len(post_ids),
+        "fl" : DISPLAY_FIELDS if highlight_text else DISPLAY_FIELDS_WITH_TEXT,
+        "group" : "true",
+        "group.field" : "post_id",
+        "group.limit" : num_rows,
+        "group.sort" : "upvote desc"
+    }
+
+    if not grouped:
+        # Grouping needs a single valued post_id, which older cores only get with a rebuild. The top comments of all the posts
+        # come back in one list and parse_comments_from_post_ids splits them, a post may get fewer than num_rows when the
+        # comments of other posts outrank its own.
+        for key in ["group", "group.field", "group.limit", "group.sort"]:
+            del params[key]
+        params.update({"rows": num_rows * len(post_ids) * UNGROUPED_ROWS_FACTOR, "sort": "upvote desc"})
+
+    if facets:
+        params["json.facet"] = LABEL_FACETS
+
+    # The comment query matches everything, so the words to highlight are given separately
+    if highlight_text:
+        params.update(build_highlight_params(fragsize))
+        params.update({"hl.q": highlight_text, "hl.qparser": "edismax", "qf": "text"})
+
+    return params
+
+
+def parse_comments_from_post_ids(response_json, post_ids, num_rows=10):
+    # Comments keyed by the (unprefixed) post id, posts without comments map to an empty list
+    comments = {post_id: [] for post_id in post_ids}
+
+    if "grouped" not in response_json:
+        # Ungrouped request, the docs are sorted by upvotes already
+        for doc in response_json["response"]["docs"]:
+            post_id = doc.post_id[len("t3_"):] if doc.post_id else None
+            if post_id in comments and len(comments[post_id]) < num_rows:
+                comments[post_id].append(doc)
+        return comments
+
+    for group in response_json["grouped"]["post_id"]["groups"]:
+        post_id = group["groupValue"][len("t3_"):] if group["groupValue"] else None
+        if post_id in comments:
+            comments[post_id] = group["doclist"]["docs"]
+
+    return comments
+
+
+def parse_documents(response_json):
+    # Replaces every returned doc (plain or grouped) with a RedditDoc, carrying its joined highlight snippets
+    highlighting = response_json.get("highlighting", {})
+
+    def parse(docs):
+        return [RedditDoc.from_solr(doc, " ... ".join(highlighting.get(doc["id"], {}).get("text", [])) or None) for doc in docs]
+
+    if "response" in response_json:
+        response_json["response"]["docs"] = parse(response_json["response"]["docs"])
+    for group in response_json.get("grouped", {}).get("post_id", {}).get("groups", []):
+        group["doclist"]["docs"] = parse(group["doclist"]["docs"])
+
+    return response_json
+
+
+def parse_label_counts(response_json, label_init_format):
+    # Turns the label facets into counts keyed like "vader_positive", "roberta_negative", ...
+    label_count = dict(label_init_format)
+
+    for field, prefix in LABEL_FACET_FIELDS.items():
+        for bucket in response_json.get("facets", {}).get(field, {}).get("buckets", []):
+            key = f"{prefix}_{bucket['val']}"
+            if key in label_count:
+                label_count[key] += bucket["count"]
+
+    return label_count
+
+
+def parse_label_tokens(response_json, tokens_init_format):
+    # Word cloud counts per label, same keys as parse_label_counts. A term counts once per document it appears in.
+    tokens = {key: Counter(value) for key, value in tokens_init_format.items()}
+
+    for field, prefix in LABEL_FACET_FIELDS.items():
+        for bucket in response_json.get("facets", {}).get(field, {}).get("buckets", []):
+            key = f"{prefix}_{bucket['val']}"
+            if key in tokens:
+                tokens[key].update({term["val"]: term["count"] for term in bucket.get("terms", {}).get("buckets", [])})
+
+    return tokens
+
+
+def build_field_analysis_params(text, field):
+    # Runs text through the field's index analyzer, the one that produced its terms
+    params = {
+        "analysis.fieldname": field,
+        "analysis.fieldvalue": text,
+        "json.nl": "flat"
+    }
+
+    return params
+
+
+def parse_analyzed_terms(response_json, field):
+    # The stages come as a flat [tokenizer or filter, tokens, ...] list, the last tokens are what ends up in the index
+    stages = response_json.get("analysis", {}).get("field_names", {}).get(field, {}).get("index", [])
+    return [token["text"] for token in stages[-1]] if stages else []
+
+
+def parse_spellcheck_collation(response_json, text):
+    # Best collated suggestion for the whole query, or None. Collations come as a flat ["collation", value, ...] list.
+    collations = response_json.get("spellcheck", {}).get("collations", [])
+
+    for name, value in zip(collations[::2], collations[1::2]):
+        if name != "collation":
+            continue
+        collation = value["collationQuery"] if isinstance(value, dict) else value
+        if collation.lower() != text.lower():
+            return collation
+
+    return None
+
@@ -0,0 +1,175 @@
+# Declarative description of the search_reddit schema and config, applied by SolrManager.apply_schema_and_config
+import hashlib
+import json
+
+SCHEMA_API_PATH = "/api/cores/search_reddit/schema"
+CONFIG_API_PATH = "/api/cores/search_reddit/config"
+
+# Stored as a user property in the core's config overlay
+VERSION_PROPERTY = "search_reddit.bootstrap.version"
+
+FIELD_TYPES = [
+    {"name":"text_reddit",
+     "class":"solr.TextField",
+     "positionIncrementGap":"100",
+     "multiValued":True,
+     "indexAnalyzer":{"tokenizer":{"class":"solr.WhitespaceTokenizerFactory"},
+                      "filters":[{"class":"solr.StopFilterFactory","ignoreCase":True,"words":"stopwords.txt"},
+                                 {"class":"solr.LowerCaseFilterFactory"},
+                                 {"class":"solr.SnowballPorterFilterFactory","language":"English"},
+                                 {"class":"solr.NGramFilterFactory","minGramSize":2,"maxGramSize":20}]},
+     "queryAnalyzer":{"tokenizer":{"class":"solr.WhitespaceTokenizerFactory"},
+                      "filters":[{"class":"solr.StopFilterFactory","ignoreCase":True,"words":"stopwords.txt"},
+                                 {"class":"solr.SynonymGraphFilterFactory","ignoreCase":True,"synonyms":"synonyms.txt","expand":True},
+                                 {"class":"solr.LowerCaseFilterFactory"},
+                                 {"class":"solr.SnowballPorterFilterFactory","language":"English"}]}},
+    # Whole words for the word clouds, roughly what utils.get_tokens_freq_dict produced
+    {"name":"text_terms",
+     "class":"solr.TextField",
+     "positionIncrementGap":"100",
+     "multiValued":True,
+     "analyzer":{"tokenizer":{"class":"solr.StandardTokenizerFactory"},
+                 "filters":[{"class":"solr.LowerCaseFilterFactory"},
+                            {"class":"solr.StopFilterFactory","ignoreCase":True,"words":"lang/stopwords_en.txt"},
+                            {"class":"solr.KStemFilterFactory"}]}},
+]
+
+FIELDS = [
+    {"name":"author","type":"string","stored":True,"indexed":True,"multiValued":False,"omitNorms":True,"docValues":True},
+    {"name":"text","type":"text_reddit","stored":True,"indexed":True,"required":True},
+    {"name":"created_utc","type":"pdates","stored":True,"indexed":True,"multiValued":False,"omitNorms":True,"docValues":True},
+    {"name":"edited","type":"pdates","stored":True,"indexed":True},
+    {"name":"id","type":"string","stored":True,"indexed":True,"multiValued":False,"required":True},
+    {"name":"num_comments","type":"pdoubles","stored":True,"indexed":True,"multiValued":False,"omitNorms":True,"docValues":True},
+    {"name":"permalink","type":"string","stored":True,"multiValued":False},
+    {"name":"upvote","type":"plong","stored":True,"indexed":True,"multiValued":False,"omitNorms":True,"docValues":True},
+    {"name":"subreddit_name","type":"string","stored":True,"multiValued":True},
+    {"name":"upvote_ratio","type":"pdoubles","stored":True,"indexed":True,"multiValued":False,"omitNorms":True,"docValues":True},
+    {"name":"url","type":"string","stored":True,"multiValued":False},
+    {"name":"type","type":"string","stored":True,"multiValued":True},
+    # Single valued with docValues so comments can be grouped by their post
+    {"name":"post_id","type":"string","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+
+    # Labels are faceted on for the Text Analysis tab, docValues keep that cheap
+    {"name":"vader_sentiment","type":"string","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+    {"name":"vader_subjectivity","type":"string","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+    {"name":"textblob_sentiment","type":"string","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+    {"name":"textblob_subjectivity","type":"string","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+    {"name":"label","type":"string","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+    # Probability from classification_utils.sarcasm, range filtered from the sidebar
+    {"name":"sarcasm_score","type":"pfloat","stored":True,"indexed":True,"multiValued":False,"docValues":True},
+
+    # Only faceted on, filled from text by the copy field below
+    {"name":"text_terms","type":"text_terms","stored":False,"indexed":True},
+]
+
+COPY_FIELDS = [
+    {"source":"text","dest":"text_terms"},
+]
+
+# What a change left for python -m solr_utils.solr_manager --rebuild means for the app until then
+REINDEX_EFFECTS = {
+    ("replace-field", "post_id"): "comments are matched to their posts without Solr's grouping, some posts may show fewer comments than asked for",
+    ("add-copy-field", "text_terms"): "text_terms stays empty, so the word clouds have no words to show"
+}
+
+SEARCH_COMPONENTS = [
+    # Spellcheck on the text field, analysed like the queries against it
+    {"name":"spellcheck",
+     "class":"solr.SpellCheckComponent",
+     "queryAnalyzerFieldType":"text_reddit",
+     "spellchecker":{"name":"default",
+                     "field":"text",
+                     "classname":"solr.DirectSolrSpellChecker",
+                     "distanceMeasure":"internal",
+                     "accuracy":0.5,
+                     "maxEdits":2,
+                     "minPrefix":1,
+                     "maxInspections":5,
+                     "minQueryLength":4,
+                     "maxQueryFrequency":0.01}},
+]
+
+REQUEST_HANDLERS = [
+    # The search handler, with the _default configset's defaults. Spellcheck only runs when a request asks for it.
+    {"name":"/query",
+     "class":"solr.SearchHandler",
+     "defaults":{"echoParams":"explicit",
+                 "wt":"json",
+                 "indent":"true",
+                 "spellcheck.dictionary":"default"},
+     "last-components":["spellcheck"]},
+]
+
+# Changes whenever anything above changes, so an up to date core can skip the whole apply step
+SCHEMA_VERSION = hashlib.sha1(json.dumps([FIELD_TYPES, FIELDS, COPY_FIELDS, SEARCH_COMPONENTS, REQUEST_HANDLERS], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def normalize(value):
+    # Solr echoes most scalars back as strings, compare everything as strings
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def matches(desired, live):
+    # Only the keys we declare are compared, Solr adds its own defaults to what it returns
+    if isinstance(desired, dict):
+        return isinstance(live, dict) and all(key in live and matches(value, live[key]) for key, value in desired.items())
+    if isinstance(desired, list):
+        return isinstance(live, list) and len(desired) == len(live) and all(matches(d, l) for d, l in zip(desired, live))
+    return normalize(desired) == normalize(live)
+
+
+def diff_definitions(desired_list, live_list, add_command, replace_command):
+    live_by_name = {item["name"]: item for item in live_list}
+    commands = {}
+
+    for desired in desired_list:
+        live = live_by_name.get(desired["name"])
+        if live is None:
+            commands.setdefault(add_command, []).append(desired)
+        elif not matches(desired, live):
+            commands.setdefault(replace_command, []).append(desired)
+
+    return commands
+
+
+def get_schema_commands(live_schema):
+    # Field types go first so new fields can refer to them within the same request
+    commands = diff_definitions(FIELD_TYPES, live_schema["fieldTypes"], "add-field-type", "replace-field-type")
+    commands.update(diff_definitions(FIELDS, live_schema["fields"], "add-field", "replace-field"))
+
+    # Copy fields have no name, they are either there or not
+    live_copy_fields = [{"source": item["source"], "dest": item["dest"]} for item in live_schema.get("copyFields", [])]
+    missing_copy_fields = [item for item in COPY_FIELDS if item not in live_copy_fields]
+    if missing_copy_fields:
+        commands["add-copy-field"] = missing_copy_fields
+
+    return commands
+
+
+def split_schema_commands(commands):
+    # New fields and field types leave the indexed documents valid and go in place. Changed definitions and copy fields only
+    # take effect for documents indexed after them, those wait for an explicit rebuild.
+    in_place = {command: items for command, items in commands.items() if command in ("add-field-type", "add-field")}
+    reindex = {command: items for command, items in commands.items() if command not in in_place}
+    return in_place, reindex
+
+
+def describe_commands(commands):
+    return ", ".join(f"{command} {item.get('name', item.get('dest'))}" for command, items in commands.items() for item in items)
+
+
+def get_command_keys(commands):
+    # (command, name) pairs, copy fields go by their dest
+    return {(command, item.get("name", item.get("dest"))) for command, items in commands.items() for item in items}
+
+
+def get_config_commands(live_config):
+    live_components = [dict(value, name=name) for name, value in live_config.get("searchComponent", {}).items()]
+    live_handlers = [dict(value, name=name) for name, value in live_config.get("requestHandler", {}).items()]
+
+    commands = diff_definitions(SEARCH_COMPONENTS, live_components, "add-searchcomponent", "update-searchcomponent")
+    commands.update(diff_definitions(REQUEST_HANDLERS, live_handlers, "add-requesthandler", "update-requesthandler"))
+    return commands
@@ -1,42 +1,115 @@
+# Run as a module it syncs the search_reddit core with the CSV, or rebuilds the core from it. A rebuild is the only way schema
+# changes that need a reindex get applied, labels written by atomic updates (batch_inference --solr, sarcasm --solr) are lost
+# and have to be written again. Run from the search_engine directory:
+#   python -m solr_utils.solr_manager --sync
+#   python -m solr_utils.solr_manager --rebuild
+import argparse
 import os
 import shutil
 
 import requests
 import subprocess
+import threading
+import time
 
 import json
-import xml.etree.ElementTree as ET
 
 # Delete later
 import pandas as pd
 from collections import defaultdict
 
+from solr_utils.transport import DEFAULT_BASE_URL, SolrTransport
+from solr_utils.ingest import BulkIngestor
+from solr_utils.delta_sync import DeltaSync
+from solr_utils.schema import (CONFIG_API_PATH, REINDEX_EFFECTS, SCHEMA_API_PATH, SCHEMA_VERSION, VERSION_PROPERTY,
+                               describe_commands, get_command_keys, get_config_commands, get_schema_commands, split_schema_commands)
+from solr_utils.queries import (ANALYSIS_PATH, HIGHLIGHT_FRAGSIZE, QUERY_PATH, build_comments_from_post_ids_params,
+                                build_field_analysis_params, build_text_query_params, parse_analyzed_terms,
+                                parse_comments_from_post_ids, parse_documents, parse_label_counts, parse_label_tokens)
+from utils.query_cache import QueryCache, normalize_query
+
 class SolrManager:
-    def __init__(self, solr_dir, csv_path):
+    def __init__(self, solr_dir, csv_path, base_url=DEFAULT_BASE_URL, transport=None, bootstrap=True):
         self.solr_dir = solr_dir
         self.csv_path = csv_path
-        self.solrconfig_xml_filepath = os.path.join(solr_dir, "server\solr\search_reddit\conf\solrconfig.xml")
+        self.transport = transport or SolrTransport(base_url)
+        self.ingestor = BulkIngestor(self.transport, checkpoint_path=csv_path + ".ingest_checkpoint.json")
+        self.delta_sync = DeltaSync(self.ingestor, csv_path + ".manifest.json")
+
+        # Last health probe result and when it was taken
+        self.health = None
+        self.health_checked_at = 0.0
+        self.bootstrap_lock = threading.Lock()
+
+        # Solr responses shared by every session, dropped whenever the index changes
+        self.query_cache = QueryCache()
+        self.index_version = None
 
-        # Check if Solr is already running and the core exists
-        if not self.check_solr_status() or not self.core_exists():
+        # Schema changes that wait for a rebuild as (command, name) pairs, None until looked up
+        self.pending_reindex = None
+
+        if bootstrap:
+            self.bootstrap()
+
+    def bootstrap(self):
+        if not self.check_solr_status():
             self.start_solr()
-            self.delete_existing_core()
-            self.create_core()
-            self.add_custom_schema()
-            self.add_spellcheck()
-            self.refresh_core()
+
+        # Only rebuild from scratch when the core itself is missing
+        if not self.core_exists():
+            self.rebuild_core()
+            return
+
+        # Cheap when nothing changed, picks up new fields and config definitions otherwise. Never reindexes by itself: a rebuild
+        # drops the labels written by atomic updates, so changes that need one wait for python -m solr_utils.solr_manager --rebuild
+        self.apply_schema_and_config()
+
+        # A previous load was interrupted, continue from the last acknowledged batch
+        if self.ingestor.has_checkpoint():
             self.ingest_data()
+        # The CSV changed since the last load, e.g. the day's new rows, only send the differences
+        elif self.delta_sync.needs_sync(self.csv_path):
+            self.sync_data()
+
+    def probe_health(self, max_age=30):
+        # One core STATUS call tells if Solr is up and the core is loaded, the result is reused for max_age seconds
+        if self.health is not None and time.monotonic() - self.health_checked_at < max_age:
+            return self.health
+
+        try:
+            response = self.transport.get("/solr/admin/cores", params={"action": "STATUS", "core": "search_reddit"}, timeout=2)
+            core_status = response.json()["status"].get("search_reddit")
+            self.health = {"running": True, "core_exists": bool(core_status)}
+        except (requests.RequestException, ValueError, KeyError):
+            self.health = {"running": False, "core_exists": False}
+            core_status = None
+
+        # Any commit, including commitWithin ones from other writers, bumps the index version
+        index_version = (core_status or {}).get("index", {}).get("version")
+        if index_version != self.index_version:
+            self.query_cache.clear()
+            self.index_version = index_version
+            # A rebuild changes the index too
+            self.pending_reindex = None
+
+        self.health_checked_at = time.monotonic()
+        return self.health
+
+    def ensure_ready(self, max_age=30):
+        # Cheap on every rerun, only bootstraps again if Solr or the core went away
+        health = self.probe_health(max_age)
+        if not health["running"] or not health["core_exists"]:
+            # The manager is shared by every session, only one of them should rebuild
+            with self.bootstrap_lock:
+                if not self.check_solr_status() or not self.core_exists():
+                    self.bootstrap()
+                self.health = None
 
     def core_exists(self):
-        response = requests.get("http://localhost:8983/solr/admin/cores", params={"action": "STATUS"})
-        return "search_reddit" in response.json()["status"]
+        return self.probe_health(max_age=0)["core_exists"]
 
     def check_solr_status(self):
-        result = subprocess.run([os.path.join(self.solr_dir, "bin\\solr.cmd"), "status"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if result.stdout == 'No running Solr nodes found.\n':
-            return False
-        else:
-            return True
+        return self.probe_health(max_age=0)["running"]
     
     def start_solr(self):
         try:
@@ -49,7 +122,7 @@ class SolrManager:
 
     def delete_existing_core(self):
         # Delete any existing core
-        response = requests.get("http://localhost:8983/solr/admin/cores?action=UNLOAD&core=search_reddit&deleteInstanceDir=True&deleteDataDir=True")
+        response = self.transport.get("/solr/admin/cores", params={"action": "UNLOAD", "core": "search_reddit", "deleteInstanceDir": "True", "deleteDataDir": "True"})
 
         # Check the response
         if response.status_code == 200:
@@ -71,157 +144,166 @@ class SolrManager:
         shutil.copytree(source_dir, destination_dir)
 
         # Create core
-        response = requests.get("http://localhost:8983/solr/admin/cores?action=CREATE&name=search_reddit&instanceDir=search_reddit")
+        response = self.transport.get("/solr/admin/cores", params={"action": "CREATE", "name": "search_reddit", "instanceDir": "search_reddit"}, timeout=60)
 
         if response.status_code == 200:
             print("Core created successfully.")
         else:
             print("Error in creating core.")
 
-    def add_custom_schema(self):
-        schema_list = []
-        
-        schema_list.append({"add-field-type":
-                                {"name":"text_reddit",
-                                "class":"solr.TextField",
-                                "positionIncrementGap":"100",
-                                "multiValued":True,
-                                "indexAnalyzer":{"tokenizer":
-                                                    {"class":"solr.WhitespaceTokenizerFactory"},
-                                                    "filters":[{"class":"solr.StopFilterFactory",
-                                                                "ignoreCase":True,"words":"stopwords.txt"},
-                                                                {"class":"solr.LowerCaseFilterFactory"},
-                                                                {"class":"solr.SnowballPorterFilterFactory","language":"English"},
-                                                                {"class":"solr.NGramFilterFactory","minGramSize":2,"maxGramSize":20}]},
-                                                                "queryAnalyzer":{"tokenizer":{"class":"solr.WhitespaceTokenizerFactory"},
-                                                                                "filters":[{"class":"solr.StopFilterFactory", "ignoreCase":True,"words":"stopwords.txt"},
-                                                                                            {"class":"solr.SynonymGraphFilterFactory","ignoreCase":True,"synonyms":"synonyms.txt","expand":True},
-                                                                                            {"class":"solr.LowerCaseFilterFactory"},
-                                                                                            {"class":"solr.SnowballPorterFilterFactory","language":"English"}]}}}
-        )
-        schema_list.append({"add-field":{"name":"author","type":"string","stored":True,"indexed":True, "multiValued":False, "omitNorms":True,"docValues":True}})
-        schema_list.append({"add-field":{"name":"text","type":"text_reddit","stored":True,"indexed":True,"required":True}})
-        schema_list.append({"add-field":{"name":"created_utc","type":"pdates","stored":True,"indexed":True, "multiValued":False, "omitNorms":True,"docValues":True}})
-        schema_list.append({"add-field":{"name":"edited","type":"pdates","stored":True,"indexed":True}})
-        schema_list.append({"add-field":{"name":"id","type":"string","stored":True,"indexed":True,"multiValued":False,"required":True}})
-        schema_list.append({"add-field":{"name":"num_comments","type":"pdoubles","stored":True,"indexed":True, "multiValued":False, "omitNorms":True,"docValues":True}})
-        schema_list.append({"add-field":{"name":"permalink","type":"string","stored":True,"multiValued":False}})
-        # schema_list.append({"add-field":{"name":"score","type":"plong","stored":True,"indexed":True, "multiValued":False, "omitNorms":True,"docValues":True}})
-        schema_list.append({"add-field":{"name":"upvote","type":"plong","stored":True,"indexed":True, "multiValued":False, "omitNorms":True,"docValues":True}})
-        schema_list.append({"add-field":{"name":"subreddit_name","type":"string","stored":True,"multiValued":True}})
-        schema_list.append({"add-field":{"name":"upvote_ratio","type":"pdoubles","stored":True,"indexed":True, "multiValued":False, "omitNorms":True,"docValues":True}})
-        schema_list.append({"add-field":{"name":"url","type":"string","stored":True,"multiValued":False}})
-        schema_list.append({"add-field":{"name":"type","type":"string","stored":True,"multiValued":True}})
-        schema_list.append({"add-field":{"name":"post_id","type":"string","stored":True,"multiValued":True}})
-
-        schema_list.append({"add-field":{"name":"vader_sentiment","type":"string","stored":True,"multiValued":False}})
-        schema_list.append({"add-field":{"name":"vader_subjectivity","type":"string","stored":True,"multiValued":False}})
-        schema_list.append({"add-field":{"name":"textblob_sentiment","type":"string","stored":True,"multiValued":False}})
-        schema_list.append({"add-field":{"name":"textblob_subjectivity","type":"string","stored":True,"multiValued":False}})
-        schema_list.append({"add-field":{"name":"label","type":"string","stored":True,"multiValued":False}})
-
-
-        for schema_dict in schema_list:
-            response = requests.get("http://localhost:8983/api/cores/search_reddit/schema", params=schema_dict)
-            
-            # Check the response
-            if response.status_code == 200:
-                print(f"Added schema with name: {schema_dict[list(schema_dict.keys())[0]]['name']}")
-            else:
-                print(f"Could not add schema with name: {schema_dict[list(schema_dict.keys())[0]]['name']}")
-
-    def add_spellcheck(self):
-        # Parse the XML file
-        tree = ET.parse(self.solrconfig_xml_filepath)
-        root = tree.getroot()
-
-        # Find the element with name "spellcheck" and change its value
-        for elem in root.iter('str'):
-            if elem.attrib.get('name') == 'spellcheck':
-                elem.text = 'true'
-        
-        # Find the element with name "queryAnalyzerFieldType" and change its value
-        for elem in root.iter('str'):
-            if elem.attrib.get('name') == 'queryAnalyzerFieldType':
-                elem.text = 'text_reddit'
-
-        # Find the element with name "field" under "spellchecker" and change its value
-        for elem in root.iter('lst'):
-            if elem.attrib.get('name') == 'spellchecker':
-                for child_elem in elem.iter('str'):
-                    if child_elem.attrib.get('name') == 'field':
-                        child_elem.text = 'text'
-
-        # Write back the modified XML to the file
-        tree.write(self.solrconfig_xml_filepath)
-
-    def ingest_data(self):
-        # Open and read the CSV file
-        with open(self.csv_path, "rb") as file:
-            # Make the POST request with the CSV file as the request body
-            response = requests.post("http://localhost:8983/solr/search_reddit/update?commit=true", data=file, headers={"Content-type":"application/csv"})
-        
-        # Check the response status
+    def rebuild_core(self):
+        self.delete_existing_core()
+        self.create_core()
+        self.apply_schema_and_config(reindex=True)
+        self.ingest_data(resume=False)
+
+    def get_bootstrap_version(self):
+        response = self.transport.get(CONFIG_API_PATH + "/overlay")
+
         if response.status_code == 200:
-            print("CSV data successfully sent to Solr.")
+            return response.json()["overlay"].get("userProps", {}).get(VERSION_PROPERTY)
         else:
-            print("CSV data was not sent, error code: ", response.status_code)  
+            return None
 
-    def get_text_query_result(self, text, type, date_range=None, num_rows=10, phrase_search=False):
+    def get_schema_commands(self, bootstrap_version):
+        # Nothing to do if the core was bootstrapped with the current definitions
+        if bootstrap_version == SCHEMA_VERSION:
+            return {}
+
+        return get_schema_commands(self.transport.get(SCHEMA_API_PATH).json()["schema"])
+
+    def get_pending_reindex(self):
+        # Looked up once, and again after the index changed
+        if self.pending_reindex is None:
+            _, reindex_commands = split_schema_commands(self.get_schema_commands(self.get_bootstrap_version()))
+            self.pending_reindex = get_command_keys(reindex_commands)
+        return self.pending_reindex
+
+    def apply_schema_and_config(self, reindex=False):
+        # reindex is set when every document is about to be sent again, then changed definitions can go in as well
+        self.pending_reindex = None
+        bootstrap_version = self.get_bootstrap_version()
+        if bootstrap_version == SCHEMA_VERSION:
+            print("Schema and config are up to date.")
+            return
+
+        # Only send what differs from the live schema, in a single bulk request
+        schema_commands, reindex_commands = split_schema_commands(self.get_schema_commands(bootstrap_version))
+        if reindex:
+            schema_commands.update(reindex_commands)
+            reindex_commands = {}
+
+        if schema_commands:
+            response = self.transport.post(SCHEMA_API_PATH, json=schema_commands, timeout=60)
 
-        if len(text.split(" ")) > 1:
-            # If searching for the whole phrase
-            if phrase_search:
-                query = f'text:"{text}"'
+            # Check the response
+            if response.status_code == 200:
+                print(f"Applied schema changes: {describe_commands(schema_commands)}")
             else:
-                query = f'text:({text.replace(" ", " AND ")})'
+                print("Could not apply schema changes, error: ", response.text)
+                return
+
+        if reindex_commands:
+            print(f"Schema changes that need a full reindex were not applied: {describe_commands(reindex_commands)}. "
+                  f"Run python -m solr_utils.solr_manager --rebuild to apply them, then write the classifier labels again.")
+            for change in get_command_keys(reindex_commands) & REINDEX_EFFECTS.keys():
+                print(f"Until the rebuild {REINDEX_EFFECTS[change]}.")
+
+        # Config API edits reload the core by themselves. The version stamp goes in with them once nothing is left pending,
+        # until then every start checks the schema again.
+        config_commands = get_config_commands(self.transport.get(CONFIG_API_PATH).json()["config"])
+        if not reindex_commands:
+            config_commands["set-user-property"] = {VERSION_PROPERTY: SCHEMA_VERSION}
+        if not config_commands:
+            return
+        response = self.transport.post(CONFIG_API_PATH, json=config_commands, timeout=60)
+
+        # Check the response
+        if response.status_code == 200:
+            print(f"Applied config changes, bootstrap version {SCHEMA_VERSION if not reindex_commands else 'unchanged'}.")
         else:
-            query = f"text:({text})"
+            print("Could not apply config changes, error: ", response.text)
 
-        query = query + f" AND type:{type}"
+    def ingest_data(self, resume=True):
+        # Send the CSV in parallel JSON batches, resuming from the checkpoint if a previous load was interrupted
+        try:
+            stats = self.ingestor.ingest_csv(self.csv_path, resume=resume)
+            print(f"CSV data successfully sent to Solr: {stats['docs']} docs in {stats['seconds']:.1f} sec ({stats['docs_per_sec']:.0f} docs/sec).")
+        except (requests.RequestException, OSError) as e:
+            print("CSV data was not sent completely, rerun to resume. Error: ", e)
+            return
 
-        if date_range:
-            query = query + f" AND created_utc:[{str(date_range[0])}T00:00:00Z TO {str(date_range[1])}T23:59:59Z]"
+        self.query_cache.clear()
 
-        print("get_text_query_result's query:")
-        print(query)
+        # Record what is now indexed so later syncs only send the differences
+        self.delta_sync.write_manifest(self.csv_path)
 
-        params = {
-            "q" : query,
-            "rows" : num_rows,
-            "sort": "upvote desc"
-        }
+    def sync_data(self):
+        # Incremental sync: new rows are added, changed rows sent as atomic updates, vanished ids deleted
+        try:
+            stats = self.delta_sync.sync_csv(self.csv_path)
+            print(f"Index synced with CSV: {stats['new']} new, {stats['changed']} changed, {stats['deleted']} deleted, {stats['unchanged']} unchanged.")
+        except (requests.RequestException, OSError) as e:
+            print("Index was not synced, error: ", e)
+        finally:
+            # Part of the changes may have been committed even if the sync failed
+            self.query_cache.clear()
+
+    def get_cached_json(self, key, path, params):
+        def fetch():
+            response = self.transport.get(path, params=params)
 
-        response = requests.get("http://localhost:8983/solr/search_reddit/query", params=params)
-        print(params)
-        print(response)
+            # Check the response
+            if response.status_code == 200:
+                return parse_documents(response.json())
+            else:
+                return None
 
-        # Check the response
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
- 
-    def get_comment_from_post_id_and_text(self, post_id, text, num_rows=10):
+        return self.query_cache.get_or_compute(key, fetch)
 
-        result = []
+    def get_text_query_result(self, text, type, date_range=None, num_rows=10, phrase_search=False, facets=False,
+                              spellcheck=False, highlight=False, fragsize=HIGHLIGHT_FRAGSIZE, cursor_mark=None,
+                              sarcasm=None):
 
-        # Reddit uses id with "t3_" prefix to indicate post_id globally
-        post_id = f"t3_{post_id}"
+        params = build_text_query_params(text, type, date_range, num_rows, phrase_search, facets, spellcheck, highlight,
+                                         fragsize, cursor_mark, sarcasm)
 
-        query = f"post_id:{post_id} AND type:comment"
+        key = ("query", normalize_query(text), type, tuple(date_range) if date_range else None, num_rows, phrase_search, facets,
+               spellcheck, highlight, fragsize, cursor_mark, sarcasm)
+        return self.get_cached_json(key, QUERY_PATH, params)
+ 
+    def get_analyzed_terms(self, text, field="text_terms"):
+        # The words of text the way field indexes them, e.g. to leave the searched words out of the word clouds
+        response_json = self.get_cached_json(("analysis", field, normalize_query(text)), ANALYSIS_PATH,
+                                             build_field_analysis_params(text, field))
 
-        params = {
-            "q" : query,
-            "rows" : num_rows,
-            "sort": "upvote desc"
-        }
-        response = requests.get("http://localhost:8983/solr/search_reddit/query", params=params).json()
+        # Check the response
+        if response_json is None:
+            return []
+        return parse_analyzed_terms(response_json, field)
+
+    def get_comments_and_label_stats_from_post_ids(self, post_ids, num_rows=10, label_init_format=None, tokens_init_format=None,
+                                                   facets=True, highlight_text=None, fragsize=HIGHLIGHT_FRAGSIZE,
+                                                   sarcasm=None):
+        # Top comments for a whole list of posts in a single grouped request, keyed by post id,
+        # plus the label counts and word cloud terms over all comments of these posts
+        label_count = dict(label_init_format or {})
+        tokens = dict(tokens_init_format or {})
+        if not post_ids:
+            return {}, label_count, tokens
+
+        # Until a rebuild makes post_id single valued, Solr refuses to group on it
+        grouped = ("replace-field", "post_id") not in self.get_pending_reindex()
+        key = ("comments", tuple(post_ids), num_rows, facets, normalize_query(highlight_text or ""), fragsize, sarcasm, grouped)
+        params = build_comments_from_post_ids_params(post_ids, num_rows, facets, highlight_text, fragsize, sarcasm, grouped)
+        response_json = self.get_cached_json(key, QUERY_PATH, params)
 
-        if not response["response"]["numFound"] == 0:
-            return response["response"]["docs"]
+        # Check the response
+        if response_json is not None:
+            return (parse_comments_from_post_ids(response_json, post_ids, num_rows), parse_label_counts(response_json, label_count),
+                    parse_label_tokens(response_json, tokens))
         else:
-            return None
+            return {post_id: [] for post_id in post_ids}, label_count, tokens
 
     def refresh_core(self):
 
@@ -231,27 +313,35 @@ class SolrManager:
             "wt": "json"
         }
 
-        response = requests.post("http://localhost:8983/solr/admin/cores", params=params)
+        response = self.transport.post("/solr/admin/cores", params=params, timeout=60)
 
         if response.status_code == 200:
             print("Core reloaded successfully.")
         else:
             print("Core was not reloaded, error code: ", response.status_code)
 
-    def spellcheck(self, text):
 
-        params = {
-            "indent": "true",
-            "spellcheck.q": f"{text}",
-            "spellcheck": "true",
-            "spellcheck.collate": "true"
-        }
+def main():
+    repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="Delete the core and index the CSV again")
+    parser.add_argument("--sync", action="store_true", help="Send what changed in the CSV since the last load")
+    parser.add_argument("--solr-dir", default=os.path.join(repo_dir, "solr-9.5.0-slim"))
+    parser.add_argument("--csv", default=os.path.join(repo_dir, "data/merged_all_new.csv"))
+    args = parser.parse_args()
 
-        response = requests.get("http://localhost:8983/solr/search_reddit/spell", params=params)
+    if args.rebuild and args.sync:
+        parser.error("Give --rebuild or --sync, not both")
+
+    solr_manager = SolrManager(args.solr_dir, args.csv, bootstrap=not (args.rebuild or args.sync))
+    if args.rebuild or args.sync:
+        if not solr_manager.check_solr_status():
+            solr_manager.start_solr()
+    if args.rebuild:
+        solr_manager.rebuild_core()
+    elif args.sync:
+        solr_manager.sync_data()
 
-        # Check the response
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_BASE_URL = "http://localhost:8983"
+
+# Solr answers with these while a core is loading or the node is overloaded, worth retrying
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+def encode_params(params):
+    # Flatten params into (key, value) pairs, lists become repeated keys (e.g. several fq) and bools become Solr's "true"/"false"
+    pairs = []
+    for key, value in (params or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if item is None:
+                continue
+            if isinstance(item, bool):
+                item = "true" if item else "false"
+            pairs.append((key, str(item)))
+    return pairs
+
+
+class SolrTransport:
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=10, max_retries=3, backoff_factor=0.5, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        # Bounded retry with exponential backoff on connection errors and 5xx. Only idempotent methods are retried after the
+        # request went out: a POST (schema and config commands, update batches) may already have been applied when it times out.
+        retry = Retry(total=max_retries,
+                      backoff_factor=backoff_factor,
+                      status_forcelist=RETRY_STATUS_CODES,
+                      allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        # One shared keep-alive session, connections are reused across calls
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def get(self, path, params=None, timeout=None):
+        return self.session.get(self.base_url + path, params=encode_params(params), timeout=timeout or self.timeout)
+
+    def post(self, path, params=None, data=None, json=None, headers=None, timeout=None):
+        return self.session.post(self.base_url + path, params=encode_params(params), data=data, json=json, headers=headers,
+                                 timeout=timeout or self.timeout)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,240 @@
+# Typed Parquet datasets for the crawled posts and comments, partitioned by subreddit and crawl date, and label sets keyed by id.
+# Run from the search_engine directory:
+#   python -m storage_utils.store import-csvs --data-dir ../data --store ../data/store
+#   python -m storage_utils.store import-labels "../Innovation/data/sentiment_pred_bert_pretrain_and_annotator.csv" --name bert --subreddit BoltEV --store ../data/store
+#   python -m storage_utils.store summary --store ../data/store
+import argparse
+import datetime
+import glob
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+POST_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("name", pa.string()),
+    ("author", pa.string()),
+    ("author_flair_text", pa.string()),
+    ("created_utc", pa.float64()),
+    ("edited", pa.float64()),
+    ("distinguished", pa.string()),
+    ("clicked", pa.bool_()),
+    ("is_original_content", pa.bool_()),
+    ("is_self", pa.bool_()),
+    ("locked", pa.bool_()),
+    ("over_18", pa.bool_()),
+    ("saved", pa.bool_()),
+    ("spoiler", pa.bool_()),
+    ("stickied", pa.bool_()),
+    ("link_flair_text", pa.string()),
+    ("num_comments", pa.int64()),
+    ("score", pa.int64()),
+    ("upvote_ratio", pa.float64()),
+    ("title", pa.string()),
+    ("selftext", pa.string()),
+    ("permalink", pa.string()),
+    ("url", pa.string()),
+])
+
+COMMENT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("link_id", pa.string()),
+    ("parent_id", pa.string()),
+    ("subreddit_id", pa.string()),
+    ("author", pa.string()),
+    ("created_utc", pa.float64()),
+    ("edited", pa.float64()),
+    ("distinguished", pa.string()),
+    ("is_submitter", pa.bool_()),
+    ("saved", pa.bool_()),
+    ("stickied", pa.bool_()),
+    ("score", pa.int64()),
+    ("body", pa.string()),
+    ("body_html", pa.string()),
+    ("permalink", pa.string()),
+])
+
+SCHEMAS = {"posts": POST_SCHEMA, "comments": COMMENT_SCHEMA}
+
+# Moved out of the rows into the directory names, subreddit_name=BoltEV/crawl_date=2024-03-20/
+PARTITIONING = ds.partitioning(pa.schema([("subreddit_name", pa.string()), ("crawl_date", pa.date32())]), flavor="hive")
+
+# How the crawler and the notebook wrote missing values and booleans into the CSVs
+NULL_VALUES = {"", "None", "nan", "NaN"}
+TRUE_VALUES = {"True", "TRUE", "true"}
+FALSE_VALUES = {"False", "FALSE", "false"}
+
+
+def to_column(values, data_type):
+    # values are CSV strings, anything that does not parse becomes null (e.g. edited is False or a timestamp)
+    values = pd.Series(values, dtype=object).where(lambda s: ~s.isin(NULL_VALUES) & s.notna())
+    if pa.types.is_boolean(data_type):
+        return pa.array(values.map(lambda value: True if value in TRUE_VALUES else False if value in FALSE_VALUES else None), data_type)
+    if pa.types.is_integer(data_type):
+        return pa.array(pd.to_numeric(values, errors="coerce").astype("Int64"), data_type)
+    if pa.types.is_floating(data_type):
+        return pa.array(pd.to_numeric(values, errors="coerce"), data_type)
+    return pa.array(values, data_type)
+
+
+def to_table(df, kind, crawl_date):
+    # A crawler CSV frame as a typed table with the partition columns added
+    schema = SCHEMAS[kind]
+    columns = [to_column(df[field.name] if field.name in df.columns else [None] * len(df), field.type) for field in schema]
+    columns.append(pa.array(df["subreddit_name"].astype(str), pa.string()))
+    columns.append(pa.array([crawl_date] * len(df), pa.date32()))
+    return pa.Table.from_arrays(columns, schema=schema.append(pa.field("subreddit_name", pa.string())).append(pa.field("crawl_date", pa.date32())))
+
+
+def normalize_text(text):
+    return " ".join(text.split()) if isinstance(text, str) else text
+
+
+def get_source_name(path, kind):
+    return os.path.basename(path)[:-len(f"-{kind}.csv")]
+
+
+class RedditStore:
+    def __init__(self, root):
+        self.root = root
+
+    def get_path(self, kind):
+        return os.path.join(self.root, kind)
+
+    def get_label_path(self, name):
+        return os.path.join(self.root, "labels", f"{name}.parquet")
+
+    def write(self, table, kind):
+        # Rewriting a subreddit for the same crawl date replaces its files, other partitions are left alone
+        ds.write_dataset(table, self.get_path(kind), format="parquet", partitioning=PARTITIONING,
+                         basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet", existing_data_behavior="delete_matching")
+
+    def dataset(self, kind):
+        return ds.dataset(self.get_path(kind), format="parquet", partitioning=PARTITIONING)
+
+    def read(self, kind, columns=None, filter=None):
+        # Only the requested columns are read, and the filter skips whole partitions and row groups before anything is decoded, e.g.
+        #   store.read("comments", ["id", "body"], (pc.field("subreddit_name") == "BoltEV") & (pc.field("score") > 10))
+        return self.dataset(kind).to_table(columns=columns, filter=filter)
+
+    def import_csv(self, csv_path, kind, crawl_date):
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        if "subreddit_name" not in df.columns or df.empty:
+            return 0
+        # Rows without a subreddit come from the file they were in
+        df["subreddit_name"] = df["subreddit_name"].replace("", get_source_name(csv_path, kind))
+        self.write(to_table(df, kind, crawl_date), kind)
+        return len(df)
+
+    def import_csvs(self, data_dir, crawl_date=None):
+        # The crawler's {subreddit}-posts.csv and -comments.csv, the combined all-*.csv files are left out as they repeat the rest
+        crawl_date = crawl_date or datetime.date.today()
+        counts = {}
+        for kind in SCHEMAS:
+            counts[kind] = 0
+            for csv_path in sorted(glob.glob(os.path.join(data_dir, f"*-{kind}.csv"))):
+                if os.path.basename(csv_path).startswith("all-"):
+                    continue
+                rows = self.import_csv(csv_path, kind, crawl_date)
+                print(f"Imported {rows} {kind} from {csv_path}")
+                counts[kind] += rows
+        return counts
+
+    def write_labels(self, table, name):
+        # A label set is one file of id plus label columns, written to a temporary file and swapped in
+        if "id" not in table.column_names:
+            raise ValueError(f"Label set {name} has no id column")
+        # Same key type as the posts and comments, pandas can hand over large_string
+        table = table.set_column(table.column_names.index("id"), "id", table["id"].cast(pa.string()))
+        path = self.get_label_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def read_labels(self, name, columns=None):
+        if columns is not None and "id" not in columns:
+            columns = ["id"] + list(columns)
+        return pq.read_table(self.get_label_path(name), columns=columns)
+
+    def list_labels(self):
+        return sorted(os.path.basename(path)[:-len(".parquet")] for path in glob.glob(os.path.join(self.root, "labels", "*.parquet")))
+
+    def read_labeled(self, kind, labels, columns=None, filter=None):
+        # Rows joined with each label set on id, instead of merging frames on the raw text.
+        # labels maps a label set name to the columns wanted from it (None for all), e.g. {"bert": ["sentiment_pred_bert"]}
+        if columns is not None and "id" not in columns:
+            columns = ["id"] + list(columns)
+        table = self.read(kind, columns, filter)
+        for name, label_columns in labels.items():
+            table = table.join(self.read_labels(name, label_columns), "id", join_type="left outer", right_suffix=f"_{name}")
+        return table
+
+    def resolve_ids(self, texts, kind="comments", text_field="body", filter=None):
+        # For the older label CSVs that only kept the text, which had its whitespace collapsed on the way.
+        # Texts that match no row, or several rows (e.g. "Nice"), get no id.
+        texts = pd.Series(texts, dtype=object).map(normalize_text)
+        found = self.read(kind, ["id", text_field], filter).to_pandas()
+        found[text_field] = found[text_field].map(normalize_text)
+        found = found[found[text_field].isin(set(texts))]
+        counts = found[text_field].value_counts()
+        unique = found[found[text_field].map(counts) == 1]
+        return texts.map(dict(zip(unique[text_field], unique["id"])))
+
+    def import_labels(self, path, name, kind="comments", text_field="text", filter=None):
+        # Label files with an id column are stored as they are, text-keyed ones get their ids resolved once here
+        df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        df = df.drop(columns=[column for column in df.columns if column.startswith("Unnamed: ")])
+        stats = {"rows": len(df), "unresolved": 0}
+
+        if "id" not in df.columns:
+            df.insert(0, "id", self.resolve_ids(df[text_field].tolist(), kind, filter=filter).to_numpy())
+            stats["unresolved"] = int(df["id"].isna().sum())
+            # The text is already in the posts and comments, only the labels are kept
+            df = df.dropna(subset=["id"]).drop(columns=[text_field])
+
+        df = df.drop_duplicates(subset=["id"])
+        self.write_labels(pa.Table.from_pandas(df, preserve_index=False), name)
+        stats["labels"] = len(df)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["import-csvs", "import-labels", "summary"])
+    parser.add_argument("path", nargs="?", help="Label file for import-labels")
+    parser.add_argument("--store", required=True, help="Directory of the store")
+    parser.add_argument("--data-dir", default="../data", help="Crawler CSVs for import-csvs")
+    parser.add_argument("--crawl-date", type=datetime.date.fromisoformat, help="Partition the CSVs go into, defaults to today")
+    parser.add_argument("--name", help="Name of the label set")
+    parser.add_argument("--kind", choices=list(SCHEMAS), default="comments", help="What the labels are for")
+    parser.add_argument("--text-field", default="text", help="Text column of label files without ids")
+    parser.add_argument("--subreddit", help="Only match label texts against this subreddit")
+    args = parser.parse_args()
+
+    store = RedditStore(args.store)
+
+    if args.command == "import-csvs":
+        counts = store.import_csvs(args.data_dir, args.crawl_date)
+        print(f"Imported {counts['posts']} posts and {counts['comments']} comments into {args.store}")
+    elif args.command == "import-labels":
+        if not args.path or not args.name:
+            parser.error("import-labels needs a label file and --name")
+        filter = pc.field("subreddit_name") == args.subreddit if args.subreddit else None
+        stats = store.import_labels(args.path, args.name, args.kind, args.text_field, filter)
+        print(f"Stored {stats['labels']} labels as {args.name}, {stats['unresolved']} of {stats['rows']} rows matched no single {args.kind[:-1]}")
+    else:
+        for kind in SCHEMAS:
+            table = store.read(kind, ["subreddit_name", "crawl_date"])
+            print(f"{kind}: {table.num_rows} rows")
+            print(table.group_by(["subreddit_name", "crawl_date"]).aggregate([([], "count_all")]).to_pandas().to_string(index=False))
+        print(f"labels: {', '.join(store.list_labels()) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.figure import Figure
+from wordcloud import WordCloud
+
+
+def render_pie_png(values, labels, explode, title):
+    # Figure instead of pyplot, pyplot keeps global state and is not safe to use from worker threads
+    fig = Figure()
+    ax = fig.subplots()
+    ax.pie(values, labels=labels, explode=explode, startangle=90, labeldistance=1.15)
+    ax.legend(loc='upper right', bbox_to_anchor=(-0.2, 1))
+    ax.set_title(title)
+    return figure_to_png(fig)
+
+
+def render_wordcloud_png(word_freq_dict, title):
+    wc = WordCloud(background_color="rgba(255, 255, 255, 0)", mode="RGBA", min_font_size = 10)
+    wordcloud = wc.generate_from_frequencies(word_freq_dict)
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.set_title(title)
+    ax.imshow(wordcloud, interpolation='bilinear')
+    ax.axis("off")
+    return figure_to_png(fig)
+
+
+def figure_to_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", transparent=True)
+    return buffer.getvalue()
+
+
+def get_render_key(kind, *args):
+    # Same inputs, same image, whichever session asks for it
+    return hashlib.sha1(json.dumps([kind, args], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    # PNG bytes of the analysis charts, rendered on background threads and kept in a bounded LRU.
+    # Entries are futures, so a chart that is still being rendered is never rendered twice. The charts on screen go to their own
+    # threads, so they never wait behind the whole queue of precomputed ones.
+    def __init__(self, max_entries=256, max_workers=2):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self.foreground_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render-foreground")
+
+    def submit(self, kind, render, *args, foreground=False):
+        key = get_render_key(kind, *args)
+
+        with self.lock:
+            future = self.entries.get(key)
+            # A render that failed is retried instead of failing from the cache forever
+            if future is not None and future.done() and future.exception():
+                future = None
+            # Still waiting in the background queue, taken out of it and rendered now
+            if future is not None and foreground and future.cancel():
+                future = None
+            if future is not None:
+                self.entries.move_to_end(key)
+                return future
+
+            executor = self.foreground_executor if foreground else self.executor
+            future = executor.submit(render, *args)
+            self.entries[key] = future
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return future
+
+    def submit_pie(self, values, labels, explode, title):
+        return self.submit("pie", render_pie_png, values, labels, explode, title)
+
+    def submit_wordcloud(self, word_freq_dict, title):
+        return self.submit("wordcloud", render_wordcloud_png, word_freq_dict, title)
+
+    def get_pie(self, values, labels, explode, title):
+        return self.submit("pie", render_pie_png, values, labels, explode, title, foreground=True).result()
+
+    def get_wordcloud(self, word_freq_dict, title):
+        return self.submit("wordcloud", render_wordcloud_png, word_freq_dict, title, foreground=True).result()
@@ -1,12 +1,43 @@
 import streamlit as st
 import datetime
-import matplotlib.pyplot as plt
 
 from annotated_text import annotated_text
-from wordcloud import WordCloud
 from collections import Counter
 
-from utils.utils import bold_matching_words, format_text, get_text_html_color, get_tokens_freq_dict, update_tokens_and_labels
+from solr_utils.solr_manager import SolrManager
+from solr_utils.queries import parse_label_counts, parse_label_tokens, parse_spellcheck_collation
+from solr_utils.schema import REINDEX_EFFECTS
+from streamlit_utils.render_cache import RenderCache
+from utils.utils import bold_matching_words, format_text, get_text_html_color
+
+# Upper bound on the posts or comments a session can load with "Load more"
+MAX_LOADED_RESULTS = 300
+
+# Label value shown for each option of the "Analyse on which category?" radio
+LABEL_VALUES = {
+    "Positive Mood": "positive",
+    "Neutral Mood": "neutral",
+    "Negative Mood": "negative",
+    "Subjective": "subjective",
+    "Objective": "objective"
+}
+
+# Sarcasm filter for each option of the sidebar radio, see solr_utils.queries.SARCASM_FILTERS
+SARCASM_OPTIONS = {
+    "Show all": None,
+    "Hide sarcastic": "hide",
+    "Only sarcastic": "only"
+}
+
+# One SolrManager per process, shared by every session and rerun, only built when first needed
+@st.cache_resource(show_spinner="Connecting to Solr...")
+def get_solr_manager(solr_dir, csv_path):
+    return SolrManager(solr_dir, csv_path)
+
+# Rendered charts are shared by every session as well
+@st.cache_resource
+def get_render_cache():
+    return RenderCache()
 
 def init_session_states():
     if "query" not in st.session_state:
@@ -61,18 +92,17 @@ def init_session_states():
     if "query_time" not in st.session_state:
         st.session_state["query_time"] = None 
 
-def suggest_diff_query(solr_manager, query):
-    if not len(st.session_state["query"].split(' ')) > 1:
-        suggested_query = solr_manager.spellcheck(query)["spellcheck"]["suggestions"]
-        # No spell suggestions
-        if len(suggested_query) == 0:
-            return None
-        else:
-            suggested_query = suggested_query[1]["suggestion"][0]["word"]
-            return suggested_query
-        
-    else:
-        return None
+    if "search_params" not in st.session_state:
+        st.session_state["search_params"] = None
+
+    if "next_cursor_mark" not in st.session_state:
+        st.session_state["next_cursor_mark"] = None
+
+    if "pending_rebuild" not in st.session_state:
+        st.session_state["pending_rebuild"] = []
+
+    if "query_terms" not in st.session_state:
+        st.session_state["query_terms"] = []
 
 def suggest_spell_correction(button_id):
     _, message_col, _= st.columns([1,5,1])
@@ -85,10 +115,7 @@ def suggest_spell_correction(button_id):
 
 def get_results(solr_manager, tokens_init_format, label_init_format):
 
-    st.session_state["tokens"] = tokens_init_format
-    st.session_state["label_count"] = label_init_format
-
-    if st.session_state["additional_options"]["retrieve_type"] == "Posts and Comments (Will take a longer time)":
+    if st.session_state["additional_options"]["retrieve_type"] == "Posts and Comments":
         result_type = 'post'
     elif st.session_state["additional_options"]["retrieve_type"] == "Posts only":
         result_type = 'post'
@@ -113,124 +140,186 @@ def get_results(solr_manager, tokens_init_format, label_init_format):
     else:
         tmp_date_range = None
 
-    if st.session_state["additional_options"]["exact_matching"]:
-        results = solr_manager.get_text_query_result(st.session_state["query"], result_type, tmp_date_range, phrase_search=True, num_rows=st.session_state["additional_options"]["retrieve_num"])
-    else:
-        results = solr_manager.get_text_query_result(st.session_state["query"], result_type, tmp_date_range, num_rows=st.session_state["additional_options"]["retrieve_num"])
-    
+    # Kept for the "Load more" pages, which continue the same search
+    st.session_state["search_params"] = {
+        "text": st.session_state["query"],
+        "type": result_type,
+        "date_range": tmp_date_range,
+        "num_rows": st.session_state["additional_options"]["retrieve_num"],
+        "phrase_search": st.session_state["additional_options"]["exact_matching"],
+        "sarcasm": SARCASM_OPTIONS[st.session_state["additional_options"]["sarcasm"]]
+    }
+
+    # First page, with the facets and spellcheck that cover the whole search
+    results = solr_manager.get_text_query_result(**st.session_state["search_params"], facets=True, spellcheck=True, highlight=True,
+                                                 cursor_mark="*")
+
+    # Label counts and word cloud terms cover every match, not only the rows that are displayed
+    st.session_state["label_count"] = parse_label_counts(results, label_init_format)
+    st.session_state["tokens"] = parse_label_tokens(results, tokens_init_format)
+    # The query analysed like the word cloud terms, so the searched words can be left out of them
+    st.session_state["query_terms"] = solr_manager.get_analyzed_terms(st.session_state["query"])
+
     if results["response"]["numFound"] < st.session_state["additional_options"]["retrieve_num"]:
-        st.session_state["suggested_query"] = suggest_diff_query(solr_manager, st.session_state["query"])
+        # Collated by Solr in the same request, works for multi-word queries too
+        st.session_state["suggested_query"] = parse_spellcheck_collation(results, st.session_state["query"])
     else:
         st.session_state["suggested_query"] = None
 
-    if results["response"]["numFound"] == 0 and not st.session_state["suggested_query"]:
-        st.session_state["results"] = {"post": [], "comment": []}
+    st.session_state["pending_rebuild"] = [change for change in REINDEX_EFFECTS if change in solr_manager.get_pending_reindex()]
+
+    st.session_state["results"] = {"post": [], "comment": []}
+    append_results_page(solr_manager, results, "*")
+
+    precompute_analysis_images()
 
-    elif results["response"]["numFound"] == 0 and st.session_state["suggested_query"]:
-        st.session_state["results"] = {"post": [], "comment": []}
+def append_results_page(solr_manager, results, cursor_mark):
+    docs = results["response"]["docs"]
 
+    # New lists rather than appending in place, the docs may be shared through the query cache
+    if st.session_state["additional_options"]["retrieve_type"] == "Posts and Comments":
+        # Fetch the comments of all posts in one request, aligned with the post order
+        # together with the label counts and word cloud terms of all their comments
+        comments_by_post, st.session_state["label_count"], st.session_state["tokens"] = solr_manager.get_comments_and_label_stats_from_post_ids(
+            [doc.id for doc in docs], label_init_format=st.session_state["label_count"],
+            tokens_init_format=st.session_state["tokens"], highlight_text=st.session_state["query"],
+            sarcasm=st.session_state["search_params"]["sarcasm"])
+
+        st.session_state["results"]["post"] = st.session_state["results"]["post"] + docs
+        st.session_state["results"]["comment"] = st.session_state["results"]["comment"] + [comments_by_post[doc.id] for doc in docs]
+
+    elif st.session_state["search_params"]["type"] == 'post':
+        st.session_state["results"]["post"] = st.session_state["results"]["post"] + docs
     else:
+        st.session_state["results"]["comment"] = st.session_state["results"]["comment"] + docs
 
-        if st.session_state["additional_options"]["retrieve_type"] == "Posts and Comments (Will take a longer time)":
-            comment_list = []
-            for doc in results["response"]["docs"]:
-                update_tokens_and_labels(doc)
+    # Solr hands back the same cursor once there is nothing left, and a session never holds more than MAX_LOADED_RESULTS
+    next_cursor_mark = results.get("nextCursorMark")
+    loaded = len(st.session_state["results"]["post"]) or len(st.session_state["results"]["comment"])
+    st.session_state["next_cursor_mark"] = next_cursor_mark if docs and next_cursor_mark != cursor_mark and loaded < MAX_LOADED_RESULTS else None
 
-                tmp_comment_list = solr_manager.get_comment_from_post_id_and_text(doc["id"], st.session_state["query"])
-                if tmp_comment_list:
-                    for comment in tmp_comment_list:
-                        update_tokens_and_labels(comment)
-                    comment_list.append(tmp_comment_list)
-                
-                    
+def load_more_results(solr_manager):
+    # Next page of the current search, appended to what is already shown
+    cursor_mark = st.session_state["next_cursor_mark"]
+    if not cursor_mark:
+        return
 
-            st.session_state["results"] = {"post": results["response"]["docs"], "comment": comment_list}
+    results = solr_manager.get_text_query_result(**st.session_state["search_params"], highlight=True, cursor_mark=cursor_mark)
+    if results is None:
+        return
 
-        else:
-            if result_type == 'post':
-                st.session_state["results"] = {"post": results["response"]["docs"], "comment": []}
-            else:
-                st.session_state["results"] = {"post": [], "comment": results["response"]["docs"]}
+    append_results_page(solr_manager, results, cursor_mark)
 
-            for doc in results["response"]["docs"]:
-                update_tokens_and_labels(doc)
+    # Comment counts and terms changed in Posts and Comments mode
+    precompute_analysis_images()
 
-def display_analysis(model_selection, label_category):
+def display_load_more(solr_manager):
+    if st.session_state["next_cursor_mark"]:
+        _, button_col, _ = st.columns([2,1,2])
+        with button_col:
+            st.button("Load more", on_click=load_more_results, args=(solr_manager,), use_container_width=True)
+
+def get_model_prefix(model_selection):
     if model_selection == "VADER":
-        tmp_prefix = "vader"
+        return "vader"
     elif model_selection == "TextBlob":
-        tmp_prefix = "textblob"
+        return "textblob"
     else:
-        tmp_prefix = "roberta"
-    
+        return "roberta"
+
+def get_pie_inputs(tmp_prefix, label_category):
     if label_category == "Positive Mood" or label_category == "Neutral Mood" or label_category == "Negative Mood":
         # Extract values for vader_positive, vader_negative, and vader_neutral
         selected_data = {key: st.session_state["label_count"][key] for key in [f'{tmp_prefix}_positive', f'{tmp_prefix}_negative', f'{tmp_prefix}_neutral']}
         # Explode settings
         explode = [0, 0, 0] 
-        # For wordcloud
-        filter_category = f'{tmp_prefix}_sentiment'
     else:
-        if tmp_prefix == "roberta":
-            st.info("roBERTa-based model does not have analysis results for subjectivity. Please select another option.")
-            return
         # Extract values for vader_subjective, vader_objective
         selected_data = {key: st.session_state["label_count"][key] for key in [f'{tmp_prefix}_subjective', f'{tmp_prefix}_objective']}
         # Explode settings
         explode = [0, 0]
-        # For wordcloud
-        filter_category = f'{tmp_prefix}_subjectivity'
 
-    # Calculate total sum of values
+    # Calculate total sum of values, nothing to plot when none of the results are labelled yet
     total = sum(selected_data.values())
+    if total == 0:
+        return None
     # Normalize values and convert to percentages
     normalized_values = [value / total * 100 for value in selected_data.values()]
 
     labels=list(selected_data.keys())
 
-    if label_category == 'Positive Mood':
-        explode[labels.index(f'{tmp_prefix}_positive')] = 0.2 
-    elif label_category == 'Neutral Mood':
-        explode[labels.index(f'{tmp_prefix}_neutral')] = 0.2 
-    elif label_category == 'Negative Mood':
-        explode[labels.index(f'{tmp_prefix}_negative')] = 0.2 
-    elif label_category == 'Subjective':
-        explode[labels.index(f'{tmp_prefix}_subjective')] = 0.2
-    else:
-        explode[labels.index(f'{tmp_prefix}_objective')] = 0.2
+    explode[labels.index(f'{tmp_prefix}_{LABEL_VALUES[label_category]}')] = 0.2
 
     # Modify labels by removing prefix and capitalizing them, and include percentage numbers
     labels = [f"{x.replace(tmp_prefix+'_', '').capitalize()} ({normalized_values[i]:.1f}%)" for i, x in enumerate(labels)]
 
+    return normalized_values, labels, explode, f"Percentage of Category according to {tmp_prefix.capitalize()} model"
+
+def get_wordcloud_inputs(tmp_prefix, label_category, model_selection):
+    word_freq_dict = dict(st.session_state['tokens'][f'{tmp_prefix}_{LABEL_VALUES[label_category]}'])
+
+    # The searched words themselves would dominate every cloud
+    filtered_dict = {key: value for key, value in word_freq_dict.items() if key not in st.session_state["query_terms"]}
+
+    return filtered_dict, f"WordCloud of {label_category} according to {model_selection}"
+
+def precompute_analysis_images():
+    # Queue every model/category chart of the current results, so switching the radio buttons only reads the cache
+    render_cache = get_render_cache()
+
+    for model_selection in ["VADER", "TextBlob", "roBERTa-based"]:
+        tmp_prefix = get_model_prefix(model_selection)
+        for label_category in LABEL_VALUES:
+            if tmp_prefix == "roberta" and label_category in ("Subjective", "Objective"):
+                continue
+
+            pie_inputs = get_pie_inputs(tmp_prefix, label_category)
+            if pie_inputs is not None:
+                render_cache.submit_pie(*pie_inputs)
+
+            word_freq_dict, title = get_wordcloud_inputs(tmp_prefix, label_category, model_selection)
+            if len(word_freq_dict) > 0:
+                render_cache.submit_wordcloud(word_freq_dict, title)
+
+def display_analysis(model_selection, label_category):
+    tmp_prefix = get_model_prefix(model_selection)
+    
+    if label_category == "Positive Mood" or label_category == "Neutral Mood" or label_category == "Negative Mood":
+        # For wordcloud
+        filter_category = f'{tmp_prefix}_sentiment'
+    else:
+        if tmp_prefix == "roberta":
+            st.info("roBERTa-based model does not have analysis results for subjectivity. Please select another option.")
+            return
+        # For wordcloud
+        filter_category = f'{tmp_prefix}_subjectivity'
+
+    filter_value = LABEL_VALUES[label_category]
+    render_cache = get_render_cache()
+
+    # Only Posts and Comments mode fills both lists. The posts are counted over the whole search, their comments only for the
+    # posts loaded so far, so the counts grow with "Load more".
+    if st.session_state["results"]["post"] and st.session_state["results"]["comment"]:
+        st.caption(f"Counts every post matching the search, plus the comments of the {len(st.session_state['results']['post'])} "
+                   f"posts loaded so far.")
+
     pie_col, _, cloud_col = st.columns([2,0.3,2])
     with pie_col:
         # Plot the pie chart
-        fig, ax = plt.subplots()
-        ax.pie(normalized_values, labels=labels, explode=explode, startangle=90, labeldistance=1.15)
-        ax.legend(loc='upper right', bbox_to_anchor=(-0.2, 1))
-        ax.set_title(f"Percentage of Category according to {tmp_prefix.capitalize()} model")
-        st.pyplot(fig)
-    with cloud_col:
-        if label_category == 'Positive Mood':
-            word_freq_dict = dict(st.session_state['tokens'][f'{tmp_prefix}_positive'])
-            filter_value = 'positive'
-        elif label_category == 'Neutral Mood':
-            word_freq_dict = dict(st.session_state['tokens'][f'{tmp_prefix}_neutral'])
-            filter_value = 'neutral'
-        elif label_category == 'Negative Mood':
-            word_freq_dict = dict(st.session_state['tokens'][f'{tmp_prefix}_negative'])
-            filter_value = 'negative'
-        elif label_category == 'Subjective':
-            word_freq_dict = dict(st.session_state['tokens'][f'{tmp_prefix}_subjective'])
-            filter_value = 'subjective'
+        pie_inputs = get_pie_inputs(tmp_prefix, label_category)
+        if pie_inputs is None:
+            st.info("No pie chart is displayed because none of the results are labelled by this model yet.")
         else:
-            word_freq_dict = dict(st.session_state['tokens'][f'{tmp_prefix}_objective'])
-            filter_value = 'objective'
+            st.image(render_cache.get_pie(*pie_inputs), use_column_width=True)
+    with cloud_col:
+        word_freq_dict, title = get_wordcloud_inputs(tmp_prefix, label_category, model_selection)
 
-        if not len(word_freq_dict) > 0:
+        if ("add-copy-field", "text_terms") in st.session_state["pending_rebuild"]:
+            st.info("No WordCloud is displayed until the search index is rebuilt with python -m solr_utils.solr_manager --rebuild.")
+        elif not len(word_freq_dict) > 0:
             st.info("No WordCloud is displayed because there is no results for the current model and analysis setting.")
         else:
-            display_wordcloud(word_freq_dict, label_category, model_selection)
+            st.image(render_cache.get_wordcloud(word_freq_dict, title), use_column_width=True)
 
     st.write('---')
 
@@ -239,6 +328,16 @@ def display_analysis(model_selection, label_category):
 
     display_single_only(analysis_mode=True, filter_category=filter_category, filter_value=filter_value)
 
+def get_display_text(doc):
+    # Solr's highlighted snippets when there are any, else the full text bolded on the client
+    if doc.highlight:
+        return format_text(doc.highlight)
+    return format_text(bold_matching_words(st.session_state["query"], doc.text or ""))
+
+def format_label(label):
+    # Documents indexed by the preprocessing pipeline only get their labels once the classifiers have run
+    return label.capitalize() if label else "Not labelled"
+
 def display_mood_subjectivity(doc, title_font_size, content_font_size):
 
     st.markdown(f"<p style='text-align: center;font-size:{title_font_size}px;'><strong>Text Analysis:</strong></p>", unsafe_allow_html=True,
@@ -252,25 +351,25 @@ def display_mood_subjectivity(doc, title_font_size, content_font_size):
     with vader_col:
         with st.container(border=True, height=170):
             st.markdown(f"<p style='text-align: center;font-size:{title_font_size}px;'><strong>VADER model:</strong></p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Mood: <strong style='color:{get_text_html_color(doc['vader_sentiment'][0])}';'>\
-                        {doc['vader_sentiment'][0].capitalize()}</strong></p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Subjectivity: <strong style='color:{get_text_html_color(doc['vader_subjectivity'][0])}';'>\
-                        {doc['vader_subjectivity'][0].capitalize()}</strong></p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Mood: <strong style='color:{get_text_html_color(doc.vader_sentiment)}';'>\
+                        {format_label(doc.vader_sentiment)}</strong></p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Subjectivity: <strong style='color:{get_text_html_color(doc.vader_subjectivity)}';'>\
+                        {format_label(doc.vader_subjectivity)}</strong></p>", unsafe_allow_html=True)
             
     with textblob_col:
         with st.container(border=True, height=170):
             st.markdown(f"<p style='text-align: center;font-size:{title_font_size}px;'><strong>TextBlob model:</strong></p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Mood: <strong style='color:{get_text_html_color(doc['textblob_sentiment'][0])}';'>\
-                        {doc['textblob_sentiment'][0].capitalize()}</strong></p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Subjectivity: <strong style='color:{get_text_html_color(doc['textblob_subjectivity'][0])}';'>\
-                        {doc['textblob_subjectivity'][0].capitalize()}</strong></p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Mood: <strong style='color:{get_text_html_color(doc.textblob_sentiment)}';'>\
+                        {format_label(doc.textblob_sentiment)}</strong></p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Subjectivity: <strong style='color:{get_text_html_color(doc.textblob_subjectivity)}';'>\
+                        {format_label(doc.textblob_subjectivity)}</strong></p>", unsafe_allow_html=True)
             
     with roberta_col:
         with st.container(border=True, height=170):
             st.markdown(f"<p style='text-align: center;font-size:{title_font_size}px;'><strong>roBERTa-based model:</strong></p>", unsafe_allow_html=True,
                         help='roBERTa-based model does not have analysis result for subjectivity.')
-            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Mood: <strong style='color:{get_text_html_color(doc['label'][0])}';'>\
-                        {doc['label'][0].capitalize()}</strong></p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='text-align: center;font-size:{content_font_size}px;'>Mood: <strong style='color:{get_text_html_color(doc.label)}';'>\
+                        {format_label(doc.label)}</strong></p>", unsafe_allow_html=True)
 
 def display_single_only(analysis_mode=False, filter_category=None, filter_value=None):
 
@@ -312,44 +411,36 @@ def display_single_only(analysis_mode=False, filter_category=None, filter_value=
 
         if analysis_mode:
             
-            if not doc[filter_category][0] == filter_value:
+            if not getattr(doc, filter_category) == filter_value:
                 continue
 
         # Display post
         with col.container(border=True):
             annotated_text(
-                (f'Subreddit: {doc["subreddit_name"][0]}', "")
+                (f'Subreddit: {doc.subreddit_name}', "")
             )
-            st.markdown(f"<p style='font-size:20px;'>User: {doc['author'][0]}</p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='font-size:20px;'>User: {doc.author}</p>", unsafe_allow_html=True)
             if type == "Post":
-                text = format_text(bold_matching_words(st.session_state["query"], doc['text'][0]))
+                text = get_display_text(doc)
                 st.markdown(f"<p style='text-align: center;font-size:30px;'>{text}</p>", unsafe_allow_html=True)
             else:
-                text = format_text(bold_matching_words(st.session_state["query"], doc['text'][0]))
+                text = get_display_text(doc)
                 st.markdown(f"<p style='text-align: center;font-size:25px;'>{text}</p>", unsafe_allow_html=True)
 
 
-            st.write(f'{doc["upvote"][0]} **Upvotes**  **·**  Posted on: {datetime.datetime.strptime(doc["created_utc"][0], "%Y-%m-%dT%H:%M:%SZ").strftime("%d %B %Y, %I:%M%p")}')
-            st.link_button(f"Link to {result_type}", "https://www.reddit.com"+doc['permalink'][0])
+            st.write(f'{doc.upvote} **Upvotes**  **·**  Posted on: {doc.created_utc.strftime("%d %B %Y, %I:%M%p")}')
+            st.link_button(f"Link to {result_type}", "https://www.reddit.com"+doc.permalink)
 
             st.write('---')
 
             display_mood_subjectivity(doc, 18, 15)
 
-def display_wordcloud(word_freq_dict, label_category, model_selection):
-
-    query_tokens = get_tokens_freq_dict(st.session_state["query"], "list")
-    filtered_dict = {key: value for key, value in word_freq_dict.items() if key not in query_tokens}
-
-    # Create and generate a word cloud image:
-    wc = WordCloud(background_color="rgba(255, 255, 255, 0)", mode="RGBA", min_font_size = 10)
-    wordcloud = wc.generate_from_frequencies(filtered_dict)
-
-    fig, ax = plt.subplots()
-    ax.set_title(f"WordCloud of {label_category} according to {model_selection}")
-    ax.imshow(wordcloud, interpolation='bilinear')
-    ax.axis("off")
-    st.pyplot(fig)
+def display_pending_rebuild_warning():
+    if st.session_state["pending_rebuild"]:
+        _, message_col, _ = st.columns([1,5,1])
+        with message_col:
+            st.warning("The search index needs a rebuild (python -m solr_utils.solr_manager --rebuild) for the latest schema changes. "
+                       "Until then " + "; ".join(REINDEX_EFFECTS[change] for change in st.session_state["pending_rebuild"]) + ".")
 
 def display_no_result_message():
     _, message_col, _ = st.columns([1,5,1])
@@ -374,15 +465,15 @@ def display_post_and_comment():
         # Display post
         with post_col.container(border=False, height=650):
             annotated_text(
-                (f'Subreddit: {tmp_post["subreddit_name"][0]}', "")
+                (f'Subreddit: {tmp_post.subreddit_name}', "")
             )
-            st.markdown(f"<p style='font-size:20px;'>User: {tmp_post['author'][0]}</p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='font-size:20px;'>User: {tmp_post.author}</p>", unsafe_allow_html=True)
 
-            text = format_text(bold_matching_words(st.session_state["query"], tmp_post['text'][0]))
+            text = get_display_text(tmp_post)
             st.markdown(f"<p style='text-align: center;font-size:30px;'>{text}</p>", unsafe_allow_html=True)
 
-            st.write(f'{tmp_post["upvote"][0]} **Upvotes**  **·**  Posted on: {datetime.datetime.strptime(tmp_post["created_utc"][0], "%Y-%m-%dT%H:%M:%SZ").strftime("%d %B %Y, %I:%M%p")}')
-            st.link_button("Link to Post", "https://www.reddit.com"+tmp_post['permalink'][0])
+            st.write(f'{tmp_post.upvote} **Upvotes**  **·**  Posted on: {tmp_post.created_utc.strftime("%d %B %Y, %I:%M%p")}')
+            st.link_button("Link to Post", "https://www.reddit.com"+tmp_post.permalink)
 
             st.write('---')
 
@@ -396,14 +487,14 @@ def display_post_and_comment():
             if len(tmp_comment_list) > 0:
                 for comment in tmp_comment_list:
                     with st.container(border=True):
-                        st.markdown(f"<p style='font-size:15px;'>User: {comment['author'][0]}</p>", unsafe_allow_html=True)
-                        # st.markdown(f"<p style='text-align: center;font-size:20px;'>{comment['text'][0]}</p>", unsafe_allow_html=True)
+                        st.markdown(f"<p style='font-size:15px;'>User: {comment.author}</p>", unsafe_allow_html=True)
+                        # st.markdown(f"<p style='text-align: center;font-size:20px;'>{comment.text}</p>", unsafe_allow_html=True)
 
-                        text = format_text(bold_matching_words(st.session_state["query"], comment['text'][0]))
+                        text = get_display_text(comment)
                         st.markdown(f"<p style='text-align: center;font-size:20px;'>{text}</p>", unsafe_allow_html=True)
 
-                        st.write(f'{comment["upvote"][0]} **Upvotes**  **·**  Posted on: {datetime.datetime.strptime(comment["created_utc"][0], "%Y-%m-%dT%H:%M:%SZ").strftime("%d %B %Y, %I:%M%p")}')
-                        st.link_button("Link to Comment", "https://www.reddit.com"+comment['permalink'][0])
+                        st.write(f'{comment.upvote} **Upvotes**  **·**  Posted on: {comment.created_utc.strftime("%d %B %Y, %I:%M%p")}')
+                        st.link_button("Link to Comment", "https://www.reddit.com"+comment.permalink)
 
                         st.write('---')
 
@@ -0,0 +1,67 @@
+import string
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+from nltk.tokenize import word_tokenize
+
+
+class TextAnalyzer:
+    # Same output as the original get_tokens_freq_dict, but everything that does not depend on the text is built once.
+    # NLTK resources (punkt, stopwords, wordnet) must already be downloaded, see utils.ensure_nltk_resources.
+    def __init__(self, cache_size=100000):
+        self.translator = str.maketrans('', '', string.punctuation)
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.lemmatizer = WordNetLemmatizer()
+
+        # Reddit text repeats the same words a lot, so the whole per-token work is memoized
+        self.analyze_token = lru_cache(maxsize=cache_size)(self.analyze_token_uncached)
+
+    def analyze_token_uncached(self, token):
+        # Remove punctuation, drop empty tokens and stopwords, lemmatize verbs, then lowercase.
+        # Returns None for dropped tokens.
+        token = token.translate(self.translator)
+        if not token.strip() or token.lower() in self.stop_words:
+            return None
+
+        return self.lemmatizer.lemmatize(token, pos='v').lower()
+
+    def get_tokens(self, text):
+        analyze_token = self.analyze_token
+        tokens = []
+        for token in word_tokenize(text):
+            token = analyze_token(token)
+            if token is not None:
+                tokens.append(token)
+        return tokens
+
+    def get_tokens_freq(self, text):
+        return Counter(self.get_tokens(text))
+
+    def get_tokens_freq_batch(self, texts, processes=None, min_pool_size=1000, chunksize=256):
+        # Per text Counters in input order. Large batches can be spread over a process pool,
+        # each worker builds its own analyzer once.
+        texts = list(texts)
+        if not processes or processes < 2 or len(texts) < min_pool_size:
+            return [self.get_tokens_freq(text) for text in texts]
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(self.analyze_token.cache_info().maxsize,)) as executor:
+            return list(executor.map(get_tokens_freq_in_worker, texts, chunksize=chunksize))
+
+    def cache_info(self):
+        return self.analyze_token.cache_info()
+
+
+# Analyzer of the current pool worker process
+worker_analyzer = None
+
+
+def init_worker(cache_size):
+    global worker_analyzer
+    worker_analyzer = TextAnalyzer(cache_size)
+
+
+def get_tokens_freq_in_worker(text):
+    return worker_analyzer.get_tokens_freq(text)
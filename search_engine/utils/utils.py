@@ -1,12 +1,7 @@
 import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import string
 import re
-from collections import Counter
-import streamlit as st
-import json
+
+from utils.text_analyzer import TextAnalyzer
 
 # Check if NLTK resources are already downloaded
 def check_nltk_resources():
@@ -19,41 +14,43 @@ def check_nltk_resources():
         return False
     
 
-# Download NLTK resources if not already downloaded
-if not check_nltk_resources():
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
-else:
-    print("NLTK resources are already downloaded.")
+nltk_resources_ready = False
 
+# Download NLTK resources if not already downloaded, done on first use instead of at import time
+def ensure_nltk_resources():
+    global nltk_resources_ready
 
-def get_tokens_freq_dict(text, return_type='dictionary'):
-    tokens = word_tokenize(text)
+    if nltk_resources_ready:
+        return
+
+    if not check_nltk_resources():
+        nltk.download('punkt')
+        nltk.download('stopwords')
+        nltk.download('wordnet')
+    else:
+        print("NLTK resources are already downloaded.")
 
-    # Remove punctuation
-    translator = str.maketrans('', '', string.punctuation)
-    tokens_without_punctuation = [token.translate(translator) for token in tokens]
+    nltk_resources_ready = True
 
-    # Remove empty strings
-    tokens_without_empty = [token for token in tokens_without_punctuation if token.strip()]
 
-    # Remove stopwords
-    stop_words = set(stopwords.words('english'))
-    filtered_tokens = [token for token in tokens_without_empty if token.lower() not in stop_words]
+text_analyzer = None
 
-    # Lemmatize verbs
-    lemmatizer = WordNetLemmatizer()
-    lemmatized_tokens = [lemmatizer.lemmatize(token, pos='v') for token in filtered_tokens]
+# Shared analyzer, built on first use once the NLTK resources are there
+def get_text_analyzer():
+    global text_analyzer
 
-    # Convert to lowercase
-    lowercase_tokens = [token.lower() for token in lemmatized_tokens]
+    ensure_nltk_resources()
+    if text_analyzer is None:
+        text_analyzer = TextAnalyzer()
 
+    return text_analyzer
+
+
+def get_tokens_freq_dict(text, return_type='dictionary'):
     if return_type == "dictionary":
-        word_freq = Counter(lowercase_tokens)
-        return word_freq
+        return get_text_analyzer().get_tokens_freq(text)
     else:
-        return lowercase_tokens
+        return get_text_analyzer().get_tokens(text)
 
 def bold_matching_words(query, text, color="DodgerBlue"):
     # Split the query into individual words
@@ -94,63 +91,8 @@ def get_text_html_color(text):
         return "Tomato"
     elif text == "objective":
         return "Indigo"
+    elif not text:
+        # Not labelled yet
+        return "Gray"
     else: #elif text == "subjective":
         return "DarkOrange"
-    
-def update_tokens_and_labels(doc):
-
-    if doc['vader_sentiment'][0] == 'positive':
-        st.session_state["tokens"]["vader_positive"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["vader_positive"] += 1
-
-    elif doc['vader_sentiment'][0] == 'neutral':
-        st.session_state["tokens"]["vader_neutral"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["vader_neutral"] += 1
-
-    else: # if doc['vader_sentiment'][0] == 'negative':
-        st.session_state["tokens"]["vader_negative"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["vader_negative"] += 1
-
-    if doc['vader_subjectivity'][0] == 'subjective':
-        st.session_state["tokens"]["vader_subjective"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["vader_subjective"] += 1
-    
-    else:
-        st.session_state["tokens"]["vader_objective"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["vader_objective"] += 1
-
-    ###############################################
-
-    if doc['textblob_sentiment'][0] == 'positive':
-        st.session_state["tokens"]["textblob_positive"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["textblob_positive"] += 1
-
-    elif doc['textblob_sentiment'][0] == 'neutral':
-        st.session_state["tokens"]["textblob_neutral"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["textblob_neutral"] += 1
-
-    else: # if doc['textblob_sentiment'][0] == 'negative':
-        st.session_state["tokens"]["textblob_negative"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["textblob_negative"] += 1
-
-    if doc['textblob_subjectivity'][0] == 'subjective':
-        st.session_state["tokens"]["textblob_subjective"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["textblob_subjective"] += 1
-    
-    else:
-        st.session_state["tokens"]["textblob_objective"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["textblob_objective"] += 1
-
-    ###############################################
-    
-    if doc['label'][0] == 'positive':
-        st.session_state["tokens"]["roberta_positive"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["roberta_positive"] += 1
-
-    elif doc['label'][0] == 'neutral':
-        st.session_state["tokens"]["roberta_neutral"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["roberta_neutral"] += 1
-
-    else: # if doc['label'][0] == 'negative':
-        st.session_state["tokens"]["roberta_negative"].update(get_tokens_freq_dict(doc["text"][0]))
-        st.session_state["label_count"]["roberta_negative"] += 1